@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for tracker.date_extraction.
+
+Times text correction plus expiry-date extraction per OCR string over
+benchmarks/ocr_corpus.txt and prints the chosen date for each line.
+
+    python benchmarks/bench_date_extraction.py [--repeat 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracker.date_extraction import correct_ocr_text, extract_expiry_date
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocr_corpus.txt')
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip() and not line.startswith('#')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help='passes over the corpus')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+
+    for text in corpus:
+        candidate = extract_expiry_date(correct_ocr_text(text))
+        found = f'{candidate.date} {candidate.fmt} (score {candidate.score})' if candidate else '-'
+        print(f'{text[:60]:<60}  {found}')
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for text in corpus:
+            extract_expiry_date(correct_ocr_text(text))
+    elapsed = time.perf_counter() - started
+
+    parses = args.repeat * len(corpus)
+    print(f'\n{len(corpus)} strings x {args.repeat} passes: {elapsed / parses * 1e6:.1f} us per string')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Benchmark tracker.date_extraction.correct_ocr_text against the previous
+implementation (one str.replace per correction plus a re-slice per keyword).
+
+Runs over benchmarks/ocr_corpus.txt, a full ~1 KB label and long concatenated
+texts to show how each version scales with input length.
+
+    python benchmarks/bench_ocr_correction.py [--repeat 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracker.date_extraction import correct_ocr_text
+from bench_date_extraction import load_corpus
+
+
+# A whole back-of-pack label as OCR returns it (~1 KB): long, with one date block near the end
+LABEL_TEXT = (
+    'INGREDIENTS: WHOLE WHEAT FLOUR (ATTA) (62%), SUGAR, EDIBLE VEGETABLE OIL (PALM), INVERT SUGAR SYRUP,'
+    ' MILK SOLIDS (1.5%), LEAVENING AGENTS [503(II), 500(II)], IODISED SALT, EMULSIFIERS [322(I), 471], '
+    'DOUGH CONDITIONER (223), ARTIFICIAL FLAVOURING SUBSTANCES (MILK, VANILLA). CONTAINS WHEAT, MILK. MAY'
+    ' CONTAIN SOY, NUTS AND SESAME. NUTRITIONAL INFORMATION (APPROX.) PER 100 G: ENERGY 472 KCAL, PROTEIN'
+    ' 7.6 G, CARBOHYDRATE 69.5 G, OF WHICH TOTAL SUGARS 24.2 G, ADDED SUGARS 22.8 G, TOTAL FAT 18.1 G, '
+    'SATURATED FAT 8.9 G, TRANS FAT 0.1 G, CHOLESTEROL 0 MG, SODIUM 395 MG. STORE IN A COOL, DRY AND '
+    'HYGIENIC PLACE. BEST BEFORE 6 MONTHS FROM MANUFACTURE. MANUFACTURED BY: ABC FOODS PVT. LTD., PLOT '
+    'NO. 12, KINFRA INDUSTRIAL PARK, KAKKANAD, KOCHI, KERALA 682030. FSSAI LIC. NO. 10012043000123. '
+    'CUSTOMER CARE: 1800 425 0000, CARE@ABCFOODS.IN. NET WT. 250 G. MRP RS. 40.00 (INCL. OF ALL TAXES). '
+    'BATCH NO. KB2317 MFG. DATE 05/2026 EXP O9/2O27 PKD 05/26 USE BY 11/2026. UNIT SALE PRICE RS. 16.00 '
+    'PER 100 G. FOR BULK ORDERS CONTACT OUR SALES OFFICE.'
+)
+
+
+def legacy_correct_ocr_text(text):
+    """
+    Correct common OCR misreads in expiry date text for medicine, groceries, and food labels.
+    Includes context-aware replacements.
+    """
+    # Normalize and clean
+    cleaned = text.replace('\n',' ').replace('\r',' ').upper()
+
+    # Expanded corrections dictionary
+    corrections = {
+        # Month corrections
+        "5EP": "SEP",
+        "0CT": "OCT",
+        "N0V": "NOV",
+        "JULY": "JUL",
+        "AUGUST": "AUG",
+        "SEPTEMBER": "SEP",
+        "NOVEMBER": "NOV",
+        "DECEMBER": "DEC",
+        "JAN1": "JAN",
+        # Expiry prefixes
+        "E3P": "EXP",
+        "EXR": "EXP",
+        "EXPIRY": "EXP",
+        "EXPIRES": "EXP",
+        "BEST BEFORE": "BB",
+        "USE BY": "UB",
+        "MFG": "MFG",
+        "LOT": "LOT",
+        # Numbers and symbols
+        "O": "0",  # Use with caution
+        "S": "5",  # For 5 in dates
+        "Z": "2",  # For 2
+        "B": "8",  # For 8
+        "I": "1",  # For 1
+        # Separators
+        "|": "/",
+        "·": ".",
+        # Additional common misreads
+        "EXPIRY DATE": "EXP",
+        "BEST BY DATE": "BB",
+        "USE BY DATE": "UB",
+        "MANUFACTURED": "MFG",
+        "BATCH": "LOT",
+        "PRODUCED": "MFG",
+        "PACKED": "MFG",
+    }
+
+    # Apply general corrections
+    for wrong, right in corrections.items():
+        cleaned = cleaned.replace(wrong, right)
+
+    # Context-aware replacements: only replace if near date-related words
+    date_keywords = ["EXP", "BB", "UB", "MFG", "LOT"]
+    for keyword in date_keywords:
+        if keyword in cleaned:
+            # Replace numbers only in proximity to keywords (within 10 chars)
+            start = cleaned.find(keyword)
+            if start != -1:
+                end = start + len(keyword) + 10
+                segment = cleaned[start:end]
+                # Apply number corrections in this segment
+                segment = segment.replace("O", "0").replace("S", "5").replace("Z", "2").replace("B", "8").replace("I", "1")
+                cleaned = cleaned[:start] + segment + cleaned[end:]
+
+    return cleaned
+
+
+def time_per_call(func, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - started) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help='passes over the corpus')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f'{"input":<28}{"legacy":>12}{"single-pass":>14}{"speedup":>10}')
+    for label, texts, repeat in [
+        ('corpus lines', corpus, args.repeat),
+        ('label text (~1 KB)', [LABEL_TEXT], args.repeat),
+        ('corpus joined (~850 B)', [' '.join(corpus)], args.repeat),
+        ('corpus x 10 joined', [' '.join(corpus * 10)], max(args.repeat // 10, 1)),
+        ('corpus x 100 joined', [' '.join(corpus * 100)], max(args.repeat // 100, 1)),
+    ]:
+        legacy = time_per_call(legacy_correct_ocr_text, texts, repeat)
+        current = time_per_call(correct_ocr_text, texts, repeat)
+        print(f'{label:<28}{legacy * 1e6:>10.1f}us{current * 1e6:>12.1f}us{legacy / current:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
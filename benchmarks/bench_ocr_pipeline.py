@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""
+Accuracy and latency benchmark for the full expiry-date OCR pipeline.
+
+Renders a reproducible corpus of synthetic expiry labels ("EXP 04/2026",
+"BB 12.03 2025", "USE BY 4 MAR 2026", ...) with noise, blur, rotation and
+JPEG re-encoding, runs each one through ingest decode, the web scanner's
+preprocessing and tiered OCR, and reports per-stage timings and exact-date
+accuracy. Results are written as JSON so runs on different commits can be
+compared with --baseline.
+
+    python benchmarks/bench_ocr_pipeline.py [--count 200] [--seed 1]
+        [--preprocess view|none] [--no-tiered] [--json out.json]
+        [--baseline previous.json] [--save-images DIR]
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expirytracker.settings')
+
+import django
+
+django.setup()
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from tracker.date_extraction import correct_ocr_text, extract_expiry_date
+from tracker.imaging import decode_image, preprocess_expiry_frame
+from tracker.ocr import recognize_expiry, tier_stats
+
+MONTH_NAMES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+# name -> (label template, whether the label carries a day); fields: d, m, Y, yy, MON
+TEMPLATES = {
+    'exp_dd_mm_yyyy': ('EXP {d:02d}/{m:02d}/{Y}', True),
+    'exp_mm_yyyy': ('EXP {m:02d}/{Y}', False),
+    'bb_dd.mm_yyyy': ('BB {d:02d}.{m:02d} {Y}', True),
+    'use_by_d_mon_yyyy': ('USE BY {d} {MON} {Y}', True),
+    'best_before_dd_mon_yy': ('BEST BEFORE {d:02d} {MON} {yy}', True),
+    'exp_iso': ('EXP {Y}-{m:02d}-{d:02d}', True),
+    'expiry_mon_yyyy': ('EXPIRY {MON} {Y}', False),
+    'mfg_and_exp': ('MFG {md:02d}/{mm:02d}/{mY} EXP {d:02d}/{m:02d}/{Y}', True),
+}
+
+FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_PLAIN, cv2.FONT_HERSHEY_COMPLEX]
+STAGES = ('decode', 'preprocess', 'recognize', 'parse', 'total')
+
+
+def make_sample(rng, template_name, today):
+    """Random label text for a template plus the date the pipeline should return"""
+    template, has_day = TEMPLATES[template_name]
+    expiry = today + datetime.timedelta(days=rng.randint(30, 3 * 365))
+    made = expiry - datetime.timedelta(days=rng.randint(90, 720))
+    text = template.format(
+        d=expiry.day, m=expiry.month, Y=expiry.year, yy=expiry.year % 100, MON=MONTH_NAMES[expiry.month - 1],
+        md=made.day, mm=made.month, mY=made.year,
+    )
+    return text, expiry if has_day else expiry.replace(day=1)
+
+
+def render_label(rng, text):
+    """Draw a label on a packaging-like background and degrade it; returns JPEG bytes and the distortion used"""
+    width, height = rng.choice([(640, 480), (480, 640), (1280, 720)])
+    background = rng.randint(170, 255)
+    image = np.full((height, width, 3), background, dtype=np.uint8)
+    # Faint colour cast so the CLAHE path has something to work on
+    image[:] = np.clip(image.astype(np.int16) + np.array([rng.randint(-25, 0) for _ in range(3)]), 0, 255)
+
+    font = rng.choice(FONTS)
+    thickness = rng.choice([1, 2, 2, 3])
+    scale = 1.0
+    while True:
+        (text_w, text_h), _ = cv2.getTextSize(text, font, scale + 0.1, thickness)
+        if text_w > width * 0.9:
+            break
+        scale += 0.1
+    # Leave a margin so rotation does not push characters off the frame
+    scale = max(0.4, scale * rng.uniform(0.5, 0.85))
+    (text_w, text_h), _ = cv2.getTextSize(text, font, scale, thickness)
+    top = 60 + text_h  # below the NET WT line
+    origin = (rng.randint(5, max(6, width - text_w - 5)), rng.randint(top, max(top + 1, height - 30)))
+    ink = rng.randint(0, 70)
+    cv2.putText(image, 'NET WT 200G', (10, 40), FONTS[0], 0.8, (ink, ink, ink), 1, cv2.LINE_AA)
+    cv2.putText(image, text, origin, font, scale, (ink, ink, ink), thickness, cv2.LINE_AA)
+
+    angle = rng.uniform(-8, 8)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    image = cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+    blur = rng.choice([0, 0, 3, 5])
+    if blur:
+        image = cv2.GaussianBlur(image, (blur, blur), 0)
+
+    noise = rng.uniform(0, 18)
+    if noise:
+        grain = np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, noise, image.shape)
+        image = np.clip(image + grain, 0, 255).astype(np.uint8)
+
+    quality = rng.randint(45, 90)
+    encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+    distortion = {'size': [width, height], 'angle': round(angle, 2), 'blur': blur,
+                  'noise_sigma': round(noise, 2), 'jpeg_quality': quality}
+    return encoded, distortion
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def summarize(values):
+    return {
+        'mean_ms': round(statistics.fmean(values) * 1000, 2),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+        'max_ms': round(max(values) * 1000, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    today = datetime.date.today()
+    settings.OCR_TIERED_ENABLED = args.tiered
+    if args.save_images:
+        os.makedirs(args.save_images, exist_ok=True)
+
+    timings = {stage: [] for stage in STAGES}
+    by_template = {name: {'samples': 0, 'correct': 0} for name in TEMPLATES}
+    failures = []
+    correct = 0
+
+    for index in range(args.count):
+        template_name = rng.choice(sorted(TEMPLATES))
+        text, expected = make_sample(rng, template_name, today)
+        encoded, distortion = render_label(rng, text)
+        if args.save_images:
+            with open(os.path.join(args.save_images, f'{index:04d}_{template_name}.jpg'), 'wb') as f:
+                f.write(encoded)
+
+        started = time.perf_counter()
+        image = decode_image(encoded)
+        decoded = time.perf_counter()
+        frame = preprocess_expiry_frame(image) if args.preprocess == 'view' else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        preprocessed = time.perf_counter()
+        ocr_text, candidate = recognize_expiry(frame)
+        recognized = time.perf_counter()
+        # recognize_expiry already parsed the text; time the parse stage on its own
+        extract_expiry_date(correct_ocr_text(ocr_text))
+        parsed = time.perf_counter()
+
+        timings['decode'].append(decoded - started)
+        timings['preprocess'].append(preprocessed - decoded)
+        timings['recognize'].append(recognized - preprocessed)
+        timings['parse'].append(parsed - recognized)
+        timings['total'].append(recognized - started)
+
+        got = candidate.date if candidate else None
+        by_template[template_name]['samples'] += 1
+        if got == expected:
+            correct += 1
+            by_template[template_name]['correct'] += 1
+        elif len(failures) < args.max_failures:
+            failures.append({'index': index, 'template': template_name, 'label': text, 'expected': expected.isoformat(),
+                             'got': got.isoformat() if got else None, 'ocr_text': ocr_text, 'distortion': distortion})
+
+    for stats in by_template.values():
+        stats['accuracy'] = round(stats['correct'] / stats['samples'], 4) if stats['samples'] else None
+
+    return {
+        'commit': git_commit(),
+        'config': {'count': args.count, 'seed': args.seed, 'preprocess': args.preprocess, 'tiered': args.tiered},
+        'accuracy': round(correct / args.count, 4) if args.count else 0.0,
+        'correct': correct,
+        'samples': args.count,
+        'stages': {stage: summarize(values) for stage, values in timings.items() if values},
+        'by_template': by_template,
+        'tiers': tier_stats.snapshot(),
+        'failures': failures,
+    }
+
+
+def print_report(result, baseline=None):
+    print(f'commit {result["commit"]}  {result["config"]}')
+    line = f'exact-date accuracy: {result["accuracy"]:.1%} ({result["correct"]}/{result["samples"]})'
+    if baseline:
+        line += f'  [baseline {baseline["accuracy"]:.1%}, {(result["accuracy"] - baseline["accuracy"]) * 100:+.1f} pts]'
+    print(line)
+
+    print(f'\n{"stage":<12}{"mean":>10}{"p50":>10}{"p95":>10}{"max":>10}')
+    for stage, stats in result['stages'].items():
+        line = f'{stage:<12}{stats["mean_ms"]:>8.1f}ms{stats["p50_ms"]:>8.1f}ms{stats["p95_ms"]:>8.1f}ms{stats["max_ms"]:>8.1f}ms'
+        if baseline and stage in baseline['stages']:
+            line += f'  (p50 {stats["p50_ms"] - baseline["stages"][stage]["p50_ms"]:+.1f}ms)'
+        print(line)
+
+    print(f'\n{"template":<24}{"accuracy":>10}')
+    for name, stats in result['by_template'].items():
+        if stats['samples']:
+            print(f'{name:<24}{stats["accuracy"]:>10.1%}  ({stats["correct"]}/{stats["samples"]})')
+
+    if result['tiers']:
+        print('\ntiers: ' + ', '.join(f'{tier} {stats["accepted"]}/{stats["attempts"]} accepted, avg {stats["avg_seconds"] * 1000:.0f}ms'
+                                      for tier, stats in result['tiers'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=200, help='number of synthetic labels')
+    parser.add_argument('--seed', type=int, default=1, help='corpus seed; keep it fixed to compare commits')
+    parser.add_argument('--preprocess', choices=['view', 'none'], default='view',
+                        help="'view' uses the web scanner preprocessing, 'none' only converts to grayscale")
+    parser.add_argument('--no-tiered', dest='tiered', action='store_false', help='skip the Tesseract tier')
+    parser.add_argument('--json', metavar='PATH', help='write the full result as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='JSON from an earlier run to diff against')
+    parser.add_argument('--save-images', metavar='DIR', help='also write the rendered labels as JPEGs')
+    parser.add_argument('--max-failures', type=int, default=25, help='misreads kept in the JSON output')
+    args = parser.parse_args()
+
+    result = run(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f'\nwrote {args.json}')
+
+
+if __name__ == '__main__':
+    main()
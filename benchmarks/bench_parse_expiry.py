@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Benchmark tracker.views.parse_expiry_date_string against the strptime/dateutil
+chain it replaced, over the date strings add_item actually receives: ISO dates
+from the OCR scanners, dates typed into the confirm form, and messier OCR text.
+
+Every string is first checked to parse to the same date with both
+implementations. Timings are reported for the old chain, the shape classifier
+without the memo (every call a miss) and the memoized function (repeat strings).
+
+    python benchmarks/bench_parse_expiry.py [--count 20000] [--seed 1] [--repeat 5]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expirytracker.settings')
+
+import django
+
+django.setup()
+
+from dateutil.parser import parse as date_parser
+
+from tracker import views
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# name -> (weight, template); fields: d, m, Y, yy, MON, MONTH
+SHAPES = {
+    'iso': (50, '{Y}-{m:02d}-{d:02d}'),           # what the OCR views put in the add-item link
+    'iso_slash': (5, '{Y}/{m:02d}/{d:02d}'),
+    'year_month': (5, '{Y}-{m:02d}'),
+    'mm_yyyy': (10, '{m:02d}/{Y}'),               # medicine packs, typed into the confirm form
+    'mm-yyyy': (3, '{m}-{Y}'),
+    'dd_mm_yyyy': (8, '{d:02d}/{m:02d}/{Y}'),
+    'mon_yyyy': (8, '{MON} {Y}'),
+    'mon_upper': (4, '{MON_UPPER} {Y}'),
+    'month_yyyy': (2, '{MONTH} {Y}'),             # dateutil fallback
+    'dotted': (2, '{d:02d}.{m:02d}.{Y}'),         # dateutil fallback
+    'invalid_day': (1, '{Y}-02-30'),
+    'garbage': (2, 'EXP {m:02d}/{yy:02d}?'),
+}
+
+
+def _legacy_parse(date_str):
+    """parse_expiry_date_string as it was before the shape classifier"""
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m", "%m/%d/%Y", "%d/%m/%Y", "%m/%Y", "%m-%Y", "%b %Y"):
+        try:
+            parsed = datetime.datetime.strptime(date_str, fmt)
+            if fmt in ["%Y-%m", "%Y/%m", "%m/%Y", "%m-%Y", "%b %Y"]:
+                return parsed.replace(day=1).date()
+            return parsed.date()
+        except ValueError:
+            continue
+    try:
+        parsed = date_parser(date_str)
+        return parsed.date()
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def make_corpus(rng, count, distinct):
+    """count strings drawn (with repeats, like real traffic) from `distinct` generated ones"""
+    today = datetime.date.today()
+    names = sorted(SHAPES)
+    weights = [SHAPES[name][0] for name in names]
+    pool = []
+    for _ in range(distinct):
+        name = rng.choices(names, weights)[0]
+        day = today + datetime.timedelta(days=rng.randint(0, 3 * 365))
+        pool.append((name, SHAPES[name][1].format(
+            d=day.day, m=day.month, Y=day.year, yy=day.year % 100, MON=MONTH_NAMES[day.month - 1],
+            MON_UPPER=MONTH_NAMES[day.month - 1].upper(), MONTH=day.strftime('%B'),
+        )))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def time_calls(func, strings, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in strings:
+            func(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000, help='strings parsed per run')
+    parser.add_argument('--distinct', type=int, default=2000, help='distinct strings in the corpus')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per implementation; the best is reported')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = make_corpus(rng, args.count, args.distinct)
+    strings = [text for _, text in corpus]
+
+    mismatches = [(name, text) for name, text in set(corpus) if _legacy_parse(text) != views.parse_expiry_date_string(text)]
+    if mismatches:
+        for name, text in mismatches[:10]:
+            print(f'MISMATCH {name}: {text!r} legacy={_legacy_parse(text)} new={views.parse_expiry_date_string(text)}')
+        sys.exit(1)
+    print(f'{len(set(strings))} distinct strings parse identically')
+
+    def unmemoized(text):
+        return views._parse_date_shape(text) or views._parse_expiry_date_string_slow(text)
+
+    views._parse_expiry_date_string.cache_clear()
+    results = {
+        'legacy strptime chain': time_calls(_legacy_parse, strings, args.repeat),
+        'shape classifier': time_calls(unmemoized, strings, args.repeat),
+        'memoized': time_calls(views.parse_expiry_date_string, strings, args.repeat),
+    }
+    legacy = results['legacy strptime chain']
+    print(f'\n{"implementation":<24}{"total":>10}{"per call":>12}{"speedup":>10}')
+    for name, seconds in results.items():
+        print(f'{name:<24}{seconds * 1000:>8.1f}ms{seconds / len(strings) * 1e6:>10.2f}us{legacy / seconds:>9.1f}x')
+
+    print('\nper shape (shape classifier vs legacy, us per call):')
+    for name in sorted(SHAPES):
+        sample = [text for shape, text in corpus if shape == name]
+        if sample:
+            old = time_calls(_legacy_parse, sample, args.repeat) / len(sample) * 1e6
+            new = time_calls(unmemoized, sample, args.repeat) / len(sample) * 1e6
+            print(f'  {name:<14}{old:>8.2f} -> {new:>6.2f}')
+    print(f'\nmemo: {views._parse_expiry_date_string.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Product lookup benchmark: the old Product.objects.get(barcode=...) query on the
+unindexed products.barcode column versus the GTIN catalog (tracker.catalog).
+
+Builds a throwaway test database from the configured DATABASES entry (the
+real data is never touched), fills the products table with --products rows
+whose barcodes are stored as UPC-A, EAN-13 or GTIN-14, builds the catalog with
+sync_catalog() and then looks products up the way scanners send them, often
+in a different representation than the stored one. The catalog passes run with
+the lookup cache (tracker.product_cache) emptied before every call; the last
+pass replays skewed traffic (most scans from --popular products, some unknown
+barcodes) through the cache.
+
+    python benchmarks/bench_product_lookup.py [--products 1000000] [--lookups 1000]
+        [--legacy-lookups 50] [--popular 100] [--seed 1]
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expirytracker.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+
+from tracker.catalog import lookup_products, sync_catalog
+from tracker.gtin import gtin_check_digit
+from tracker.models import Product
+from tracker.product_cache import product_cache
+
+INSERT_BATCH = 10000
+
+
+def random_gtin(rng):
+    """(stored form, scanned form) of one random product code"""
+    body = ''.join(rng.choice('0123456789') for _ in range(11))
+    upca = body + gtin_check_digit(body)
+    forms = [upca, '0' + upca, '00' + upca]  # UPC-A, EAN-13, GTIN-14
+    if rng.random() < 0.5:
+        # Half of the catalog is EAN-13 only (non-US products)
+        ean = '8' + body[1:] + '0'
+        ean = ean[:12] + gtin_check_digit(ean[:12])
+        forms = [ean, '0' + ean]
+    return rng.choice(forms), rng.choice(forms)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def report(name, durations, hits, total):
+    print(f'{name:<34}{statistics.fmean(durations) * 1000:>9.3f}ms{percentile(durations, 0.5) * 1000:>9.3f}ms'
+          f'{percentile(durations, 0.95) * 1000:>9.3f}ms   hits {hits}/{total}')
+
+
+def populate(rng, count):
+    scanned = []
+    started = time.perf_counter()
+    batch = []
+    seen = set()
+    for pk in range(1, count + 1):
+        stored, scan = random_gtin(rng)
+        while stored in seen:
+            stored, scan = random_gtin(rng)
+        seen.add(stored)
+        batch.append(Product(id=pk, barcode=stored, product_name=f'Product {pk}'))
+        if len(scanned) < 100000:
+            scanned.append(scan)
+        if len(batch) == INSERT_BATCH:
+            Product.objects.bulk_create(batch)
+            batch = []
+    Product.objects.bulk_create(batch)
+    print(f'inserted {count} products in {time.perf_counter() - started:.1f}s')
+    return scanned
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    with connection.schema_editor() as editor:
+        editor.create_model(Product)  # unmanaged, so migrate does not create it
+    scanned = populate(rng, args.products)
+
+    started = time.perf_counter()
+    result = sync_catalog()
+    print(f'sync_catalog: {result["catalog"]} keys in {time.perf_counter() - started:.1f}s\n')
+
+    settings.PRODUCT_CATALOG_FALLBACK = False
+    queries = [rng.choice(scanned) for _ in range(args.lookups)]
+    print(f'{"lookup":<34}{"mean":>11}{"p50":>11}{"p95":>11}')
+
+    durations, hits = [], 0
+    for barcode in queries[:args.legacy_lookups]:
+        started = time.perf_counter()
+        product = Product.objects.filter(barcode=barcode).first()
+        durations.append(time.perf_counter() - started)
+        hits += product is not None
+    report('legacy barcode = (unindexed)', durations, hits, len(durations))
+
+    durations, hits = [], 0
+    for barcode in queries:
+        product_cache.clear()
+        started = time.perf_counter()
+        product = lookup_products([barcode])[barcode]
+        durations.append(time.perf_counter() - started)
+        hits += product is not None
+    report('catalog, one barcode', durations, hits, len(durations))
+
+    durations, hits = [], 0
+    for start in range(0, len(queries), 25):
+        chunk = queries[start:start + 25]
+        product_cache.clear()
+        started = time.perf_counter()
+        products = lookup_products(chunk)
+        durations.append(time.perf_counter() - started)
+        hits += sum(product is not None for product in products.values())
+    report('catalog, 25 barcodes per query', durations, hits, len(queries))
+
+    # 80% of scans from a few popular products, 5% from a few barcodes not in the catalog, the rest anything
+    popular = scanned[:args.popular]
+    unknown = [str(rng.randrange(10 ** 11, 10 ** 12)) + 'X' for _ in range(20)]
+    traffic = []
+    for _ in range(args.lookups * 10):
+        roll = rng.random()
+        if roll < 0.8:
+            traffic.append(rng.choice(popular))
+        elif roll < 0.85:
+            traffic.append(rng.choice(unknown))
+        else:
+            traffic.append(rng.choice(scanned))
+    product_cache.clear()
+    before = product_cache.stats()
+    durations, hits = [], 0
+    for barcode in traffic:
+        started = time.perf_counter()
+        product = lookup_products([barcode])[barcode]
+        durations.append(time.perf_counter() - started)
+        hits += product is not None
+    report('cached, skewed traffic', durations, hits, len(durations))
+    after = product_cache.stats()
+    counts = {name: after[name] - before[name] for name in ('local_hits', 'shared_hits', 'negative_hits', 'misses')}
+    print(f'\ncache over the skewed pass: {counts}, '
+          f'hit rate {(counts["local_hits"] + counts["shared_hits"]) / len(traffic):.1%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000000, help='rows in the products table')
+    parser.add_argument('--lookups', type=int, default=1000, help='catalog lookups to time')
+    parser.add_argument('--legacy-lookups', type=int, default=50, help='unindexed lookups to time (each is a full scan)')
+    parser.add_argument('--popular', type=int, default=100, help='products most of the skewed traffic scans')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f'database: {connection.vendor}')
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        run(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
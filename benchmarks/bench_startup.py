@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Startup benchmark: wall time, peak RSS and heavy imports of `manage.py check`.
+
+Runs the command in fresh interpreters (with -X importtime) and reports which
+vision/ML packages were imported during startup. --compare REF also measures
+a git ref (checked out into a temporary worktree), e.g. the commit before
+lazy loading, so before/after numbers come from the same machine.
+
+    python benchmarks/bench_startup.py [--runs 5] [--compare HEAD~1]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_PACKAGES = ('torch', 'torchvision', 'easyocr', 'cv2', 'numpy', 'pyzbar', 'pytesseract', 'PIL', 'scipy', 'skimage')
+
+
+def run_check(root):
+    """One `manage.py check` run: (seconds, peak RSS in MB, {package: cumulative import seconds})"""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', 'manage.py', 'check'],
+        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    stderr = proc.stderr.read()
+    _, exit_status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(exit_status)
+    if proc.returncode:
+        sys.exit(f'manage.py check failed in {root}:\n{stderr[-2000:]}')
+
+    imports = {}
+    for line in stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if name in HEAVY_PACKAGES:
+            imports[name] = int(cumulative) / 1e6
+
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024, imports
+
+
+def measure(root, runs):
+    results = [run_check(root) for _ in range(runs)]
+    return {
+        'seconds': statistics.median(r[0] for r in results),
+        'rss_mb': statistics.median(r[1] for r in results),
+        'imports': results[-1][2],
+    }
+
+
+def report(label, result):
+    print(f'{label}: {result["seconds"]:.2f}s median wall, {result["rss_mb"]:.0f} MB peak RSS')
+    if result['imports']:
+        for name, seconds in sorted(result['imports'].items(), key=lambda item: -item[1]):
+            print(f'    {name:<12} {seconds * 1000:8.1f} ms')
+    else:
+        print('    no heavy vision/ML packages imported')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='runs per tree (median is reported)')
+    parser.add_argument('--compare', metavar='REF', help='git ref to measure as the "before" tree')
+    args = parser.parse_args()
+
+    if args.compare:
+        worktree = tempfile.mkdtemp(prefix='bench-startup-')
+        subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.compare],
+                       cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        try:
+            report(f'before ({args.compare})', measure(worktree, args.runs))
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=ROOT, check=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+    report('current tree', measure(ROOT, args.runs))
+
+
+if __name__ == '__main__':
+    main()
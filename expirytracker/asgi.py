@@ -2,6 +2,10 @@
 ASGI config for expirytracker project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections to /ws/ocr/ get live camera-frame
+OCR (see tracker.live_ocr). Serve it with an ASGI server, e.g.:
+
+    uvicorn expirytracker.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +17,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expirytracker.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from tracker.live_ocr import WEBSOCKET_PATH, ocr_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == WEBSOCKET_PATH:
+            return await ocr_websocket(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 4404})
+    return await django_application(scope, receive, send)
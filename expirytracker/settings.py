@@ -179,6 +179,118 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# OCR inference runs on its own queue so it can be scaled separately from email/push tasks:
+#   celery -A expirytracker worker -Q ocr --concurrency=2 --loglevel=info
+CELERY_TASK_ROUTES = {
+    'tracker.tasks.ocr_expiry_job': {'queue': 'ocr'},
+    'tracker.tasks.ocr_expiry_batch_job': {'queue': 'ocr'},
+}
+
+# OCR reader pool: readers are loaded once per worker process and reused. Workers consuming the 'ocr'
+# queue load the OCR_LANGUAGES readers as each process starts (tracker.tasks.warm_ocr_readers).
+# Size the pool to the number of concurrent scans a worker should serve.
+OCR_LANGUAGES = ['en']
+# Languages users may pick per scan or in their profile (en, hi, ml, ta). EasyOCR has no Malayalam
+# model, so 'ml' only widens the Tesseract tier; its traineddata (tesseract-ocr-mal) must be installed.
+OCR_AVAILABLE_LANGUAGES = os.getenv('OCR_AVAILABLE_LANGUAGES', 'en,hi,ml').split(',')
+# Memory budget for loaded EasyOCR models per process; idle readers of the least recently used
+# languages are evicted to stay within it (0 = unlimited)
+OCR_MODEL_MEMORY_MB = int(os.getenv('OCR_MODEL_MEMORY_MB', '1024'))
+OCR_USE_GPU = os.getenv('OCR_USE_GPU', 'true').lower() == 'true'  # EasyOCR falls back to CPU when CUDA is missing
+OCR_READER_POOL_SIZE = int(os.getenv('OCR_READER_POOL_SIZE', '1'))
+OCR_READER_CHECKOUT_TIMEOUT = float(os.getenv('OCR_READER_CHECKOUT_TIMEOUT', '30'))  # seconds
+# Admission control per process: OCR_MAX_INFLIGHT concurrent inferences, up to OCR_MAX_QUEUED callers
+# waiting OCR_QUEUE_TIMEOUT seconds for a slot; beyond that the API answers 429 with Retry-After.
+# OCR_TORCH_THREADS = 0 splits the CPU cores evenly across in-flight inferences.
+OCR_MAX_INFLIGHT = int(os.getenv('OCR_MAX_INFLIGHT', str(OCR_READER_POOL_SIZE)))
+OCR_MAX_QUEUED = int(os.getenv('OCR_MAX_QUEUED', '8'))
+OCR_QUEUE_TIMEOUT = float(os.getenv('OCR_QUEUE_TIMEOUT', '10'))  # seconds
+OCR_TORCH_THREADS = int(os.getenv('OCR_TORCH_THREADS', '0'))
+# Queue /api/ocr/expiry/ scans on Celery and return a job id; set to false to scan inline
+OCR_ASYNC_JOBS = os.getenv('OCR_ASYNC_JOBS', 'true').lower() == 'true'
+# Batch OCR (/api/ocr/expiry/batch/): frames are letterboxed (scaled to fit, then padded) into one size
+# so they can be recognised together
+OCR_BATCH_MAX_IMAGES = int(os.getenv('OCR_BATCH_MAX_IMAGES', '10'))
+OCR_BATCH_FRAME_SIZE = (640, 480)
+# Region-of-interest OCR: detect and recognise text on a downscaled copy, then re-read
+# only expiry/MFG keyword lines below OCR_ROI_MIN_CONFIDENCE at full resolution
+# (falls back to the whole frame when nothing is detected)
+OCR_ROI_ENABLED = os.getenv('OCR_ROI_ENABLED', 'true').lower() == 'true'
+OCR_ROI_DETECT_MAX_SIDE = int(os.getenv('OCR_ROI_DETECT_MAX_SIDE', '960'))
+OCR_ROI_MIN_CONFIDENCE = float(os.getenv('OCR_ROI_MIN_CONFIDENCE', '0.5'))
+# Tiered OCR: try Tesseract first and only escalate to EasyOCR (torch) when the date
+# extractor's best candidate is below OCR_TIER_ACCEPT_CONFIDENCE
+OCR_TIERED_ENABLED = os.getenv('OCR_TIERED_ENABLED', 'true').lower() == 'true'
+OCR_TIER_ACCEPT_CONFIDENCE = float(os.getenv('OCR_TIER_ACCEPT_CONFIDENCE', '0.65'))
+OCR_TESSERACT_CONFIG = '--psm 11'
+# Per-process OCR result cache keyed on an exact digest of the preprocessed frame and scoped per user
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', '512'))
+OCR_CACHE_TTL = int(os.getenv('OCR_CACHE_TTL', '3600'))  # seconds
+
+# Live OCR WebSocket (/ws/ocr/, ASGI only): frames within OCR_LIVE_DEDUPE_DISTANCE bits of the last
+# processed frame skip OCR and vote for its date; a date is reported once OCR_LIVE_STABLE_FRAMES frames agree on it
+OCR_LIVE_DEDUPE_DISTANCE = int(os.getenv('OCR_LIVE_DEDUPE_DISTANCE', '6'))
+OCR_LIVE_STABLE_FRAMES = int(os.getenv('OCR_LIVE_STABLE_FRAMES', '2'))
+OCR_LIVE_MAX_SIDE = int(os.getenv('OCR_LIVE_MAX_SIDE', '960'))
+
+# Barcode scans run pyzbar on a grayscale copy no larger than this; retries fall back to full resolution
+BARCODE_DECODE_MAX_SIDE = int(os.getenv('BARCODE_DECODE_MAX_SIDE', '1024'))
+
+# Product lookups go through the indexed GTIN catalog (tracker.catalog); keep it current with
+# `manage.py sync_product_catalog`. With the fallback on, catalog misses also try the raw products.barcode column
+# (every zero-padded form of the GTIN).
+PRODUCT_CATALOG_FALLBACK = os.getenv('PRODUCT_CATALOG_FALLBACK', 'true').lower() == 'true'
+
+# Shared cache (tracker.product_cache's second tier). Set CACHE_URL (e.g. redis://localhost:6379/1) so
+# every worker shares product lookups; without it each process gets its own locmem cache.
+CACHE_URL = os.getenv('CACHE_URL', '')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+# Product lookup cache: an in-process LRU (PRODUCT_CACHE_MAX_ENTRIES, PRODUCT_CACHE_LOCAL_TTL) in front of
+# the shared cache (PRODUCT_CACHE_TTL). Barcodes missing from the catalog are cached for PRODUCT_CACHE_NEGATIVE_TTL.
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', '4096'))
+PRODUCT_CACHE_LOCAL_TTL = int(os.getenv('PRODUCT_CACHE_LOCAL_TTL', '60'))  # seconds
+PRODUCT_CACHE_TTL = int(os.getenv('PRODUCT_CACHE_TTL', '86400'))  # seconds
+PRODUCT_CACHE_NEGATIVE_TTL = int(os.getenv('PRODUCT_CACHE_NEGATIVE_TTL', '300'))  # seconds
+# Barcodes accepted per POST /api/products/lookup/batch/
+PRODUCT_LOOKUP_BATCH_MAX = int(os.getenv('PRODUCT_LOOKUP_BATCH_MAX', '100'))
+
+# /products/ listing: keyset pages of PRODUCT_PAGE_SIZE (?limit= up to PRODUCT_PAGE_MAX_SIZE);
+# the ?format=ndjson export reads PRODUCT_EXPORT_CHUNK_SIZE rows per query while streaming
+PRODUCT_PAGE_SIZE = int(os.getenv('PRODUCT_PAGE_SIZE', '500'))
+PRODUCT_PAGE_MAX_SIZE = int(os.getenv('PRODUCT_PAGE_MAX_SIZE', '5000'))
+PRODUCT_EXPORT_CHUNK_SIZE = int(os.getenv('PRODUCT_EXPORT_CHUNK_SIZE', '5000'))
+
+# Shelf-life predictions (tracker.shelf_life): a barcode needs SHELF_LIFE_MIN_SAMPLES items before its
+# expiry is predicted; at SHELF_LIFE_SKIP_OCR_CONFIDENCE the add-item page prefills it instead of asking for OCR.
+SHELF_LIFE_MIN_SAMPLES = int(os.getenv('SHELF_LIFE_MIN_SAMPLES', '5'))
+SHELF_LIFE_SKIP_OCR_CONFIDENCE = float(os.getenv('SHELF_LIFE_SKIP_OCR_CONFIDENCE', '0.8'))
+SHELF_LIFE_TOLERANCE_DAYS = int(os.getenv('SHELF_LIFE_TOLERANCE_DAYS', '7'))  # or 10% of the shelf life
+
+# Uploaded images (raw, multipart or base64) above IMAGE_UPLOAD_MAX_BYTES are rejected with 413;
+# anything larger than IMAGE_MAX_SIDE pixels is downscaled while it is decoded (0 keeps full size).
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_BYTES', str(8 * 1024 * 1024)))
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', '1600'))
+# Raw and base64 bodies are read into memory by Django; leave room for base64's 4/3 overhead
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_UPLOAD_MAX_BYTES * 4 // 3 + 64 * 1024
+
+# tracker.* loggers (OCR pool, per-stage OCR timing as one JSON line per scan on tracker.ocr.timing) go to the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tracker': {'handlers': ['console'], 'level': os.getenv('TRACKER_LOG_LEVEL', 'INFO')},
+    },
+}
 
 # Default from email
 DEFAULT_FROM_EMAIL = 'noreply@expirytracker.com'
@@ -8,25 +8,44 @@ from django.contrib.auth.models import User
 from django.core.files.base import ContentFile
 from django.utils import timezone
 from django.conf import settings
+from django.urls import reverse
 from datetime import datetime
+from urllib.parse import urlencode
 import base64
-import io
-from PIL import Image
+import contextvars
 import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from celery.result import AsyncResult
 from pywebpush import webpush, WebPushException
 from .models import PushSubscription
+from .ocr import (
+    OCRBusy, UnsupportedLanguage, easyocr_languages, language_suffix, languages_for, model_memory_stats,
+    ocr_governor, ocr_reader, reader_pool_stats, recognize_expiry, tier_stats,
+)
+from .ocr_cache import frame_digest, ocr_result_cache
+from .date_extraction import correct_ocr_text, extract_expiry_date
+from .barcodes import decode_barcodes
+from .catalog import find_product, lookup_products
+from .product_cache import product_cache
+from .shelf_life import predict_expiries, predict_expiry
+from .ocr_timing import server_timing_header, stage, stage_histograms, timed_ocr_view
+from .imaging import (
+    ImageUploadError, decode_base64_payload, decode_image, is_raw_upload, letterbox, read_image_payload,
+    read_image_payloads,
+)
 
 
-from .models import Item, UserProfile, Product
+from .models import BarcodeDateFormat, Item, UserProfile, Product
 from .serializers import (
     UserSerializer, ItemSerializer, ItemCreateSerializer,
     UserProfileUpdateSerializer, ProductSerializer, OCRRequestSerializer, OCRResponseSerializer,
     BarcodeRequestSerializer, BarcodeResponseSerializer, DonationRequestSerializer
 )
 # from .barcode_scanner import scan_expiry_date
-# from pyzbar.pyzbar import decode
-# import cv2
-# import numpy as np
+
+logger = logging.getLogger(__name__)
 
 
 class RegisterView(generics.CreateAPIView):
@@ -101,101 +120,320 @@ class ProductLookupView(APIView):
             return Response({'error': 'Barcode parameter required'},
                           status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            product = Product.objects.get(barcode=barcode)
+        # Matches the barcode in any GTIN form (UPC-A, EAN-13, GTIN-14, extra leading zeros)
+        product = find_product(barcode)
+        if product is not None:
             serializer = ProductSerializer(product)
             print(f"DEBUG: Found product: {product.product_name}")
-            return Response(serializer.data)
-        except Product.DoesNotExist:
-            print(f"DEBUG: Product not found for barcode: '{barcode}'")
-            return Response({'error': 'Product not found'},
-                          status=status.HTTP_404_NOT_FOUND)
+            return Response({**serializer.data, 'predicted_expiry': predict_expiry(barcode)})
+        print(f"DEBUG: Product not found for barcode: '{barcode}'")
+        return Response({'error': 'Product not found', 'predicted_expiry': predict_expiry(barcode)},
+                      status=status.HTTP_404_NOT_FOUND)
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@timed_ocr_view('ocr_expiry_api')
 def ocr_expiry_api(request):
-    """API endpoint for OCR expiry date detection"""
+    """
+    API endpoint for OCR expiry date detection.
+
+    The image is queued on the OCR Celery queue and a job id is returned straight
+    away; poll ocr_expiry_job_api with it for the result. With OCR_ASYNC_JOBS
+    disabled (e.g. no worker in development) the scan runs inline as before.
+
+    The image can be a raw body (application/octet-stream or image/*), a
+    multipart "image" file, or a base64 data URL in the "image" field.
+    Label languages come from ?languages=en,ml (or a "languages" field),
+    defaulting to the user's profile setting.
+    """
     try:
-        image_data = request.data.get('image')
-        if not image_data:
-            return Response({'error': 'No image provided'},
-                          status=status.HTTP_400_BAD_REQUEST)
+        image_data = read_image_payload(request)
+        languages = request_ocr_languages(request)
+    except ImageUploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except UnsupportedLanguage as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not getattr(settings, 'OCR_ASYNC_JOBS', True):
+        result = detect_expiry_date(image_data, languages, request.user.id)
+        if 'error' in result:
+            return error_response(result)
+        return Response(result)
+
+    from .tasks import ocr_expiry_job
+    # Celery messages are JSON, so binary uploads travel base64 encoded
+    job = submit_ocr_job(
+        ocr_expiry_job, request.user, base64.b64encode(image_data).decode('ascii'), languages=list(languages),
+    )
+    return Response({
+        'job_id': job.id,
+        'status': 'pending',
+        'status_url': reverse('api_ocr_expiry_job', args=[job.id]),
+    }, status=status.HTTP_202_ACCEPTED)
 
-        # Decode base64 image
-        if 'data:image' in image_data:
-            image_data = image_data.split(',')[1]
 
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
+def submit_ocr_job(task, user, images, **kwargs):
+    """
+    Queue an OCR task under a job id that starts with the submitter's user id,
+    so ocr_expiry_job_api can check ownership before the job has a result.
+    """
+    return task.apply_async((images, user.id), kwargs, task_id=f'{user.id}-{uuid.uuid4()}')
 
-        # Convert PIL image to numpy array for OpenCV
-        import numpy as np
-        opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
 
-        # Use the OCR function from barcode_scanner.py
-        expiry_date_str = scan_expiry_date_from_image(opencv_image)
+def job_owner(job_id):
+    owner, _, rest = job_id.partition('-')
+    return int(owner) if owner.isdigit() and rest else None
 
-        if expiry_date_str:
-            # Parse the date string
-            try:
-                # Assuming format "DD MMM YYYY"
-                parsed_date = datetime.strptime(expiry_date_str, "%d %b %Y").date()
-                return Response({
-                    'expiry_date': parsed_date.isoformat(),
-                    'confidence': 0.85  # Placeholder confidence score
-                })
-            except ValueError:
-                return Response({'error': 'Could not parse detected date'},
-                              status=status.HTTP_400_BAD_REQUEST)
-        else:
-            return Response({'error': 'No expiry date detected'},
-                          status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def ocr_expiry_job_api(request, job_id):
+    """Poll an OCR job submitted through ocr_expiry_api or ocr_expiry_batch_api"""
+    if job_owner(job_id) != request.user.id:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    job = AsyncResult(job_id)
+
+    if job.state in ('PENDING', 'RECEIVED', 'RETRY'):
+        return Response({'job_id': job_id, 'status': 'pending'})
+    if job.state == 'STARTED':
+        return Response({'job_id': job_id, 'status': 'running'})
+    if job.state == 'FAILURE':
+        return Response({'job_id': job_id, 'status': 'failed', 'error': str(job.result)},
+                      status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    result = dict(job.result or {})
+    if result.pop('user_id', None) != request.user.id:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    # Stage timings measured in the worker are reported as Server-Timing
+    timings = result.pop('timings', None)
+    if 'error' in result:
+        response = error_response({'job_id': job_id, 'status': 'done', **result})
+    else:
+        result.pop('status_code', None)
+        response = Response({'job_id': job_id, 'status': 'done', **result})
+    if timings:
+        response['Server-Timing'] = server_timing_header(timings)
+    return response
+
+
+def decode_image_payload(image_data):
+    """Decode encoded image bytes or a base64 (optionally data URL) string into an OpenCV BGR array"""
+    if isinstance(image_data, str):
+        image_data = decode_base64_payload(image_data)
+    return decode_image(image_data)
+
+
+def busy_payload(e):
+    """Payload for a scan refused by the OCR governor"""
+    return {'error': str(e), 'status_code': status.HTTP_429_TOO_MANY_REQUESTS, 'retry_after': e.retry_after}
+
+
+def error_response(result):
+    """Response for an error payload, honouring its status_code and Retry-After hint"""
+    response = Response(result, status=result.pop('status_code', status.HTTP_400_BAD_REQUEST))
+    if 'retry_after' in result:
+        response['Retry-After'] = str(result['retry_after'])
+    return response
+
+
+def expiry_date_payload(candidate):
+    """Build the API payload for the DateCandidate returned by the OCR helpers"""
+    if candidate:
+        return {
+            'expiry_date': candidate.date.isoformat(),
+            'confidence': candidate.confidence,
+            'format': candidate.fmt,
+        }
+    else:
+        return {'error': 'No expiry date detected',
+                'status_code': status.HTTP_400_BAD_REQUEST}
+
+
+def request_ocr_languages(request):
+    """OCR languages from ?languages= or a "languages" field, else the user's profile; raises UnsupportedLanguage"""
+    requested = request.query_params.get('languages')
+    if requested is None and not is_raw_upload(request):
+        requested = request.data.get('languages')
+    return languages_for(requested, request.user)
+
+
+def detect_expiry_date(image_data, languages=None, user_id=None):
+    """
+    Run the OCR pipeline on encoded image bytes or a base64 (optionally data URL) image
+    submitted by user_id (which scopes the result cache).
+    Returns a JSON-serialisable payload; failures carry 'error' and 'status_code'.
+    """
+    try:
+        opencv_image = decode_image_payload(image_data)
+
+        return expiry_date_payload(scan_expiry_date_from_image(opencv_image, languages, user_id))
+
+    except ImageUploadError as e:
+        return {'error': str(e), 'status_code': e.status_code}
+    except OCRBusy as e:
+        return busy_payload(e)
     except Exception as e:
-        return Response({'error': str(e)},
-                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return {'error': str(e), 'status_code': status.HTTP_500_INTERNAL_SERVER_ERROR}
+
+
+def detect_expiry_dates(images_data, languages=None, user_id=None):
+    """
+    Batch variant of detect_expiry_date: one payload per image, in order.
+    All decodable images go through a single batched recognition call.
+    """
+    results = [None] * len(images_data)
+    decoded = []
+    for index, image_data in enumerate(images_data):
+        try:
+            decoded.append((index, decode_image_payload(image_data)))
+        except Exception as e:
+            results[index] = {'error': f'Could not decode image: {e}',
+                              'status_code': getattr(e, 'status_code', status.HTTP_400_BAD_REQUEST)}
+
+    if decoded:
+        try:
+            candidates = scan_expiry_dates_from_images([image for _, image in decoded], languages, user_id)
+            for (index, _), candidate in zip(decoded, candidates):
+                results[index] = expiry_date_payload(candidate)
+        except OCRBusy as e:
+            for index, _ in decoded:
+                results[index] = busy_payload(e)
+        except Exception as e:
+            for index, _ in decoded:
+                results[index] = {'error': str(e),
+                                  'status_code': status.HTTP_500_INTERNAL_SERVER_ERROR}
+
+    for index, result in enumerate(results):
+        result['index'] = index
+    return results
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
-def barcode_scan_api(request):
-    """API endpoint for barcode scanning"""
+@timed_ocr_view('ocr_expiry_batch_api')
+def ocr_expiry_batch_api(request):
+    """
+    Batch OCR endpoint: accepts {"images": [...]} of base64 strings or several
+    multipart "images" files, and returns one result per image.
+    Queued on the OCR Celery queue like ocr_expiry_api unless OCR_ASYNC_JOBS is off.
+    """
     try:
-        image_data = request.data.get('image')
-        if not image_data:
-            return Response({'error': 'No image provided'},
-                          status=status.HTTP_400_BAD_REQUEST)
+        images = read_image_payloads(request)
+        languages = request_ocr_languages(request)
+    except ImageUploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except UnsupportedLanguage as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_images = getattr(settings, 'OCR_BATCH_MAX_IMAGES', 10)
+    if len(images) > max_images:
+        return Response({'error': f'At most {max_images} images per batch'},
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    if not getattr(settings, 'OCR_ASYNC_JOBS', True):
+        results = detect_expiry_dates(images, languages, request.user.id)
+        busy = [result for result in results if 'retry_after' in result]
+        if busy:
+            payload = dict(busy[0])
+            del payload['index']
+            return error_response(payload)
+        for result in results:
+            result.pop('status_code', None)
+        return Response({'results': results})
+
+    from .tasks import ocr_expiry_batch_job
+    images = [image if isinstance(image, str) else base64.b64encode(image).decode('ascii') for image in images]
+    job = submit_ocr_job(ocr_expiry_batch_job, request.user, images, languages=list(languages))
+    return Response({
+        'job_id': job.id,
+        'status': 'pending',
+        'status_url': reverse('api_ocr_expiry_job', args=[job.id]),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ocr_pool_stats_api(request):
+    """
+    Report OCR admission, reader pool usage, resident model memory, result cache,
+    per-tier hit rates/latencies and per-stage latency histograms for this worker
+    """
+    return Response({
+        'governor': ocr_governor.stats(),
+        'pools': reader_pool_stats(),
+        'models': model_memory_stats(),
+        'cache': ocr_result_cache.stats(),
+        'tiers': tier_stats.snapshot(),
+        'stages': stage_histograms.snapshot(),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def product_lookup_batch_api(request):
+    """
+    Resolve up to PRODUCT_LOOKUP_BATCH_MAX barcodes at once: {"barcodes": [...]}.
+    Returns the found products keyed by barcode (as sent) and the missing barcodes,
+    with one catalog query for whatever the lookup cache does not hold.
+    """
+    barcodes = request.data.get('barcodes') if isinstance(request.data, dict) else None
+    if not isinstance(barcodes, list) or not all(isinstance(barcode, str) for barcode in barcodes):
+        return Response({'error': 'barcodes must be a list of strings'},
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    barcodes = list(dict.fromkeys(barcode.strip() for barcode in barcodes if barcode.strip()))
+    max_barcodes = getattr(settings, 'PRODUCT_LOOKUP_BATCH_MAX', 100)
+    if len(barcodes) > max_barcodes:
+        return Response({'error': f'At most {max_barcodes} barcodes per request'},
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    products = lookup_products(barcodes)
+    predictions = predict_expiries(barcodes)
+    return Response({
+        'products': {
+            barcode: {**ProductSerializer(product).data, 'predicted_expiry': predictions[barcode]}
+            for barcode, product in products.items() if product is not None
+        },
+        'missing': [barcode for barcode, product in products.items() if product is None],
+    })
 
-        # Decode base64 image
-        if 'data:image' in image_data:
-            image_data = image_data.split(',')[1]
 
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def product_cache_stats_api(request):
+    """Report product lookup cache hit/miss rates for this worker"""
+    return Response(product_cache.stats())
 
-        # Convert to OpenCV format
-        # opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
 
-        # Decode barcode
-        # barcodes = decode(opencv_image)
-        barcodes = []  # Temporarily disabled due to import issues
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@timed_ocr_view('barcode_scan_api')
+def barcode_scan_api(request):
+    """
+    API endpoint for barcode scanning (raw body, multipart "image" file or base64 "image").
+    Returns every symbol found in the frame with its product, if known.
+    """
+    try:
+        try:
+            opencv_image = decode_image(read_image_payload(request))
+        except ImageUploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+
+        barcodes = decode_barcodes(opencv_image)
         if barcodes:
-            barcode_data = barcodes[0].data.decode('utf-8')
+            # One query for every symbol in the frame
+            products = lookup_products([symbol['barcode'] for symbol in barcodes])
+            for symbol in barcodes:
+                product = products[symbol['barcode']]
+                symbol['product'] = ProductSerializer(product).data if product else None
 
-            # Try to find product
-            try:
-                product = Product.objects.get(barcode=barcode_data)
-                product_serializer = ProductSerializer(product)
-                return Response({
-                    'barcode': barcode_data,
-                    'product': product_serializer.data
-                })
-            except Product.DoesNotExist:
-                return Response({
-                    'barcode': barcode_data,
-                    'product': None
-                })
+            # 'barcode'/'product' keep describing the first symbol for existing clients
+            return Response({
+                'barcode': barcodes[0]['barcode'],
+                'product': barcodes[0]['product'],
+                'barcodes': barcodes,
+            })
         else:
             return Response({'error': 'No barcode detected'},
                           status=status.HTTP_400_BAD_REQUEST)
@@ -205,6 +443,89 @@ def barcode_scan_api(request):
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Barcode decoding for item_scan_api runs here while OCR runs on the request thread
+# (zbar is called through ctypes and torch releases the GIL, so the two overlap)
+_barcode_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='barcode-scan')
+
+
+def item_draft(barcodes, products, candidate):
+    """Item fields for ItemCreateSerializer from a combined scan, plus what is still missing"""
+    barcode = barcodes[0]['barcode'] if barcodes else None
+    product = products.get(barcode) if barcode else None
+    draft = {
+        'name': product.product_name if product else '',
+        'category': 'Others',
+        'barcode': barcode,
+        'expiry_date': candidate.date.isoformat() if candidate else None,
+        'expiry_format': candidate.fmt if candidate else None,
+        'notes': '',
+    }
+    missing = [field for field in ('name', 'expiry_date') if not draft[field]]
+    return draft, missing
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@timed_ocr_view('item_scan_api')
+def item_scan_api(request):
+    """
+    Combined scan: one image, decoded once, read for barcodes and the expiry date
+    in parallel. Returns the product and a draft ready to POST to /api/items/.
+    Always runs inline (no Celery job) since the point is a single round trip.
+    Once the barcode is known, the OCR text is re-parsed with the date format
+    learned for that product, if any.
+    """
+    try:
+        image = decode_image(read_image_payload(request))
+        languages = request_ocr_languages(request)
+    except ImageUploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except UnsupportedLanguage as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    barcode_future = _barcode_executor.submit(contextvars.copy_context().run, decode_barcodes, image)
+    try:
+        detected_text, candidate = scan_expiry_text_from_image(image, languages, request.user.id)
+    except OCRBusy as e:
+        barcode_future.cancel()
+        return error_response(busy_payload(e))
+
+    try:
+        barcodes = barcode_future.result()
+    except Exception:
+        logger.warning('Barcode decoding failed during item scan', exc_info=True)
+        barcodes = []
+
+    fmt_hint = BarcodeDateFormat.hint_for(barcodes[0]['barcode']) if barcodes else None
+    if fmt_hint and detected_text:
+        with stage('parse'):
+            candidate = extract_expiry_date(correct_ocr_text(detected_text), fmt_hint=fmt_hint) or candidate
+
+    if not barcodes and candidate is None:
+        return Response({'error': 'No barcode or expiry date detected'},
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    products = lookup_products([symbol['barcode'] for symbol in barcodes]) if barcodes else {}
+    for symbol in barcodes:
+        product = products[symbol['barcode']]
+        symbol['product'] = ProductSerializer(product).data if product else None
+
+    draft, missing = item_draft(barcodes, products, candidate)
+    return Response({
+        'barcodes': barcodes,
+        'product': barcodes[0]['product'] if barcodes else None,
+        'expiry': {'confidence': candidate.confidence, 'format': candidate.fmt} if candidate else None,
+        'item': draft,
+        'missing': missing,
+        'ready': not missing,
+        'add_item_url': reverse('add_item') + '?' + urlencode({
+            'barcode': draft['barcode'] or '',
+            'product_name': draft['name'],
+            'expiry_date': draft['expiry_date'] or '',
+        }),
+    })
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def donate_item_api(request):
@@ -347,37 +668,70 @@ def send_push_notification(user, title, body, url=None, icon=None):
 
 
 # Helper function for OCR (adapted from existing barcode_scanner.py)
-def scan_expiry_date_from_image(image):
-    """Extract expiry date from image using OCR"""
+def scan_expiry_text_from_image(image, languages=None, user_id=None):
+    """OCR an image: returns (detected text, best expiry DateCandidate or None)"""
+    namespace = 'api' + language_suffix(languages)
     try:
-        import easyocr
-        reader = easyocr.Reader(['en'], gpu=False)
-        result = reader.readtext(image)
-
-        detected_text = " ".join([res[1] for res in result])
-
-        # Date patterns
-        import re
-        date_patterns = [
-            r'(\d{1,2}\s*[A-Za-z]{3,9}\s*\d{4})',
-            r'(\d{1,2}/\d{1,2}/\d{2,4})',
-            r'(\d{4}-\d{1,2}-\d{1,2})'
-        ]
-
-        for pattern in date_patterns:
-            match = re.search(pattern, detected_text)
-            if match:
-                date_str = match.group(1)
-                try:
-                    for fmt in ("%d %b %Y", "%d %B %Y", "%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d"):
-                        try:
-                            parsed_date = datetime.strptime(date_str, fmt)
-                            if 2000 <= parsed_date.year <= 2100:
-                                return parsed_date.strftime("%d %b %Y")
-                        except ValueError:
-                            continue
-                except Exception:
-                    continue
-        return None
+        with stage('cache'):
+            digest = frame_digest(image)
+            cached = ocr_result_cache.get(namespace, digest, user_id)
+        if cached is not None:
+            return cached['text'], cached['expiry_date']
+
+        detected_text, candidate = recognize_expiry(image, languages=languages)
+        ocr_result_cache.set(namespace, digest, {'text': detected_text, 'expiry_date': candidate}, user_id)
+        return detected_text, candidate
+    except OCRBusy:
+        raise
     except Exception:
-        return None
+        return '', None
+
+
+def scan_expiry_date_from_image(image, languages=None, user_id=None):
+    """Extract the best expiry DateCandidate from an image using OCR"""
+    return scan_expiry_text_from_image(image, languages, user_id)[1]
+
+
+def scan_expiry_dates_from_images(images, languages=None, user_id=None):
+    """
+    Extract expiry dates from several images with one batched recognition call.
+    Frames are letterboxed into OCR_BATCH_FRAME_SIZE grayscale so EasyOCR can stack
+    them without stretching portrait photos or narrow date text.
+    """
+    import cv2
+
+    width, height = getattr(settings, 'OCR_BATCH_FRAME_SIZE', (640, 480))
+    with stage('preprocess'):
+        frames = [letterbox(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), width, height) for image in images]
+
+    # Only frames that miss the result cache go through recognition
+    namespace = 'api_batch' + language_suffix(languages)
+    candidates = [None] * len(frames)
+    pending = []
+    with stage('cache'):
+        for index, frame in enumerate(frames):
+            digest = frame_digest(frame)
+            cached = ocr_result_cache.get(namespace, digest, user_id)
+            if cached is not None:
+                candidates[index] = cached['expiry_date']
+            else:
+                pending.append((index, digest))
+
+    if pending:
+        with ocr_governor.admit(), ocr_reader(easyocr_languages(languages) if languages else None) as reader:
+            with stage('recognize'):
+                results = reader.readtext_batched([frames[index] for index, _ in pending],
+                                                  n_width=width, n_height=height, batch_size=len(pending))
+        with stage('parse'):
+            for (index, digest), result in zip(pending, results):
+                detected_text = " ".join([res[1] for res in result])
+                candidates[index] = extract_expiry_date_from_text(detected_text)
+                ocr_result_cache.set(namespace, digest, {'text': detected_text, 'expiry_date': candidates[index]},
+                                     user_id)
+
+    return candidates
+
+
+def extract_expiry_date_from_text(detected_text):
+    """Best expiry DateCandidate in raw OCR text, or None"""
+    return extract_expiry_date(correct_ocr_text(detected_text))
@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 
 
 class TrackerConfig(AppConfig):
@@ -8,10 +8,23 @@ class TrackerConfig(AppConfig):
 
     def ready(self):
         from django.contrib.auth.models import User
-        from .models import UserProfile
+        from .gtin import normalize_gtin
+        from .models import Product, ProductGTIN, UserProfile
+        from .product_cache import product_cache
 
         def create_user_profile(sender, instance, created, **kwargs):
             if created:
                 UserProfile.objects.create(user=instance)
 
         post_save.connect(create_user_profile, sender=User)
+
+        # Keep the product lookup cache in step with edits made through the ORM (admin, shell)
+        def invalidate_product(sender, instance, **kwargs):
+            product_cache.invalidate([normalize_gtin(instance.barcode)])
+
+        def invalidate_catalog_entry(sender, instance, **kwargs):
+            product_cache.invalidate([instance.gtin])
+
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_product, sender=Product)
+            signal.connect(invalidate_catalog_entry, sender=ProductGTIN)
@@ -1,11 +1,10 @@
-import cv2
-from pyzbar.pyzbar import decode
 import time
-import easyocr
-import re
-from datetime import datetime
+from .ocr import recognize_expiry
 
 def scan_barcode():
+    import cv2
+    from pyzbar.pyzbar import decode
+
     cap = cv2.VideoCapture(0)
     cap.set(3, 640)  # width
     cap.set(4, 480)  # height
@@ -36,12 +35,12 @@ def scan_expiry_date():
     Capture an image from the camera and use EasyOCR to extract expiry date text.
     Returns the expiry date string if found and valid, else None.
     """
+    import cv2
+
     cap = cv2.VideoCapture(0)
     cap.set(3, 640)  # width
     cap.set(4, 480)  # height
 
-    reader = easyocr.Reader(['en'], gpu=False)  # Initialize EasyOCR reader
-
     expiry_date = None
     print("Position the expiry date in front of the camera and press 'c' to capture.")
 
@@ -52,38 +51,12 @@ def scan_expiry_date():
         if key == ord('c'):
             # Capture the frame for OCR
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            result = reader.readtext(gray)
-
-            # Combine all detected text
-            detected_text = " ".join([res[1] for res in result])
+            # Same tiered OCR and extraction engine as the web/API paths
+            detected_text, candidate = recognize_expiry(gray)
             print("Detected Text:", detected_text)
 
-            # Regex to find date patterns like 4 MAR 2024 or 04/03/2024 etc.
-            date_patterns = [
-                r'(\d{1,2}\s*[A-Za-z]{3,9}\s*\d{4})',  # e.g. 4 MAR 2024
-                r'(\d{1,2}/\d{1,2}/\d{2,4})',           # e.g. 04/03/2024
-                r'(\d{4}-\d{1,2}-\d{1,2})'              # e.g. 2024-03-04
-            ]
-
-            for pattern in date_patterns:
-                match = re.search(pattern, detected_text)
-                if match:
-                    date_str = match.group(1)
-                    try:
-                        # Try parsing the date string with multiple formats
-                        for fmt in ("%d %b %Y", "%d %B %Y", "%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d"):
-                            try:
-                                parsed_date = datetime.strptime(date_str, fmt)
-                                # Check if year is realistic (e.g. between 2000 and 2100)
-                                if 2000 <= parsed_date.year <= 2100:
-                                    expiry_date = parsed_date.strftime("%d %b %Y")
-                                    break
-                            except ValueError:
-                                continue
-                        if expiry_date:
-                            break
-                    except Exception as e:
-                        print("Date parsing error:", e)
+            if candidate:
+                expiry_date = candidate.date.strftime("%d %b %Y")
             break
         elif key == ord('q'):
             break
@@ -0,0 +1,138 @@
+"""
+Product catalog lookups by canonical GTIN.
+
+The products table is not ours (Product is managed = False) and its barcode
+column is unindexed and stores codes however they were entered. ProductGTIN
+is a managed side table holding one unique-indexed canonical key
+(tracker.gtin.normalize_gtin) per product; every lookup normalises the
+incoming barcode the same way and hits that index.
+
+sync_catalog() (manage.py sync_product_catalog) adds keys for products added
+since the last sync. Until it has run, misses fall back to a barcode IN (...)
+query over every zero-padded form of the GTIN when PRODUCT_CATALOG_FALLBACK is
+on, and any product found that way gets its key registered.
+
+Lookups go through tracker.product_cache first, which also remembers
+barcodes that are not in the catalog; adding keys invalidates them.
+
+product_page() and iter_products() read the products table itself in primary
+key order for the paginated listing and the NDJSON export.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .gtin import normalize_gtin
+from .models import Product, ProductGTIN
+from .product_cache import product_cache
+
+logger = logging.getLogger(__name__)
+
+
+def register_products(products, invalidate=True):
+    """
+    Add catalog keys for Product rows; keys already taken by another product
+    are left alone. invalidate=False leaves the lookup cache to the caller.
+    """
+    entries = {}
+    for product in products:
+        key = normalize_gtin(product.barcode)
+        if key and key not in entries:
+            entries[key] = ProductGTIN(gtin=key, product_id=product.pk, barcode=product.barcode)
+    ProductGTIN.objects.bulk_create(entries.values(), ignore_conflicts=True)
+    if invalidate:
+        product_cache.invalidate(entries)
+
+
+def find_product(barcode):
+    """The Product for a barcode in any GTIN representation, or None"""
+    return lookup_products([barcode]).get(barcode) if barcode else None
+
+
+def barcode_forms(key):
+    """The ways products.barcode may spell a canonical key: the GTIN with every amount of zero padding"""
+    if not key.isdigit():
+        return {key}
+    digits = key.lstrip('0') or '0'
+    return {key} | {digits.zfill(length) for length in range(len(digits), 15)}
+
+
+def lookup_products(barcodes):
+    """Map each barcode to its Product (or None), querying only for keys the cache does not hold"""
+    keys = {barcode: normalize_gtin(barcode) for barcode in barcodes}
+    cached = product_cache.get_many({key for key in keys.values() if key})
+    wanted = {key for key in keys.values() if key and key not in cached}
+    found = {}
+    if wanted:
+        found = {
+            entry.gtin: entry.product
+            for entry in ProductGTIN.objects.filter(gtin__in=wanted).select_related('product')
+        }
+
+    missing = wanted - set(found)
+    if missing and getattr(settings, 'PRODUCT_CATALOG_FALLBACK', True):
+        # Try every form of the GTIN, not just the one scanned: the miss is cached under the
+        # canonical key, so it has to hold for 036000291452 as much as for 0036000291452
+        forms = {form: key for key in missing for form in barcode_forms(key)}
+        forms.update({barcode.strip(): key for barcode, key in keys.items() if key in missing})
+        by_key = {}
+        for product in Product.objects.filter(barcode__in=set(forms)).order_by('pk'):
+            by_key.setdefault(forms[product.barcode], product)
+        if by_key:
+            register_products(by_key.values())
+            found.update(by_key)
+
+    product_cache.set_many({key: found.get(key) for key in wanted})
+    return {barcode: cached[key] if key in cached else found.get(key) for barcode, key in keys.items()}
+
+
+def sync_catalog(full=False, chunk_size=5000):
+    """
+    Add catalog keys for products newer than the newest one already keyed;
+    full=True rebuilds the catalog (after barcodes were edited in place).
+    Returns {'scanned': products read, 'catalog': keys in the catalog}.
+    """
+    with transaction.atomic():
+        if full:
+            ProductGTIN.objects.all().delete()
+            last = 0
+        else:
+            last = ProductGTIN.objects.aggregate(Max('product_id'))['product_id__max'] or 0
+
+        scanned = 0
+        while True:
+            # Keyset pagination: each chunk is an index range scan on the primary key
+            chunk = list(Product.objects.filter(pk__gt=last).order_by('pk').only('pk', 'barcode')[:chunk_size])
+            if not chunk:
+                break
+            register_products(chunk, invalidate=False)
+            scanned += len(chunk)
+            last = chunk[-1].pk
+
+        if full or scanned:
+            # Cheaper than deleting every new key, and clears cached misses in other processes too
+            product_cache.clear()
+
+    catalog = ProductGTIN.objects.count()
+    logger.info('Product catalog sync: scanned %s products, %s keys (full=%s)', scanned, catalog, full)
+    return {'scanned': scanned, 'catalog': catalog}
+
+
+PRODUCT_FIELDS = ('id', 'barcode', 'product_name')
+
+
+def product_page(after=0, limit=500):
+    """Up to `limit` products with id > after, as dicts in id order"""
+    return list(Product.objects.filter(pk__gt=after).order_by('pk').values(*PRODUCT_FIELDS)[:limit])
+
+
+def iter_products(after=0, chunk_size=5000):
+    """Every product with id > after, as dicts in id order, reading chunk_size rows per query"""
+    while True:
+        chunk = product_page(after, chunk_size)
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        after = chunk[-1]['id']
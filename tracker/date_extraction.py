@@ -0,0 +1,307 @@
+"""
+Expiry-date extraction shared by every OCR path (web view, API, desktop scanner).
+
+All date shapes are compiled into one alternation, so OCR text is scanned once.
+Every match becomes a scored DateCandidate and the highest-scoring one wins.
+A format learned for a product (see BarcodeDateFormat) narrows the scan to one shape.
+"""
+import datetime
+import re
+from collections import namedtuple
+
+
+# Phrase-level corrections for common OCR misreads and keyword synonyms on expiry labels
+OCR_CORRECTIONS = {
+    # Month corrections
+    "5EP": "SEP",
+    "0CT": "OCT",
+    "N0V": "NOV",
+    "JULY": "JUL",
+    "AUGUST": "AUG",
+    "SEPTEMBER": "SEP",
+    "NOVEMBER": "NOV",
+    "DECEMBER": "DEC",
+    "JAN1": "JAN",
+    # Expiry prefixes
+    "E3P": "EXP",
+    "EXR": "EXP",
+    "EXPIRY": "EXP",
+    "EXPIRES": "EXP",
+    "EXPIRY DATE": "EXP",
+    "BEST BEFORE": "BB",
+    "BEST BY DATE": "BB",
+    "USE BY": "UB",
+    "USE BY DATE": "UB",
+    "MANUFACTURED": "MFG",
+    "PRODUCED": "MFG",
+    "PACKED": "MFG",
+    "BATCH": "LOT",
+    # Separators
+    "|": "/",
+    "·": ".",
+}
+
+def _trie_pattern(phrases):
+    """
+    Compile phrases into a prefix-trie regex (an Aho-Corasick style automaton in
+    regex form): each position is tested against one branch per first character
+    instead of against every phrase, and longer phrases win over their prefixes.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return re.compile(build(trie))
+
+
+_CORRECTION_PATTERN = _trie_pattern(OCR_CORRECTIONS)
+_WHITESPACE = re.compile(r'\s+')
+
+# Letters OCR confuses with digits; only rewritten inside numeric tokens near a date keyword
+_DIGIT_CONFUSIONS = str.maketrans('OSZBI', '05281')
+# The character before a keyword is checked by the caller: a leading lookbehind would stop
+# the regex engine from skipping ahead to the keywords' first letters
+_DATE_KEYWORD = re.compile(r'(?:EXP|BB|UB|MFG|LOT)(?![A-Z0-9])')
+_ALNUM = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+# Tokens made only of digits and confusable letters, with at least one of each (e.g. "O9", "2O27")
+_SUSPECT_TOKEN = re.compile(r'(?<![A-Z0-9])[0-9OSZBI]*(?:[0-9][OSZBI]|[OSZBI][0-9])[0-9OSZBI]*(?![A-Z0-9])')
+KEYWORD_WINDOW = 10
+# From a keyword end: the window, plus the rest of a token that starts inside it
+_KEYWORD_WINDOW = re.compile(r'.{0,%d}[0-9A-Z]*' % (KEYWORD_WINDOW - 1))
+
+
+def _correct_phrase(match):
+    phrase = match.group(0)
+    return OCR_CORRECTIONS.get(phrase) or OCR_CORRECTIONS[_WHITESPACE.sub(' ', phrase)]
+
+
+def correct_ocr_text(text):
+    """
+    Correct common OCR misreads in expiry date text for medicine, groceries, and food labels.
+
+    Two passes: a single compiled trie regex rewrites misread keywords and
+    months, then numeric tokens that start within KEYWORD_WINDOW characters after
+    a date keyword get letter/digit confusions fixed (e.g. "EXP O9/2O27" ->
+    "EXP 09/2027"). Only the window after each keyword is searched for tokens.
+    Words such as "SEP" or "BATCH" are left alone.
+    """
+    cleaned = _CORRECTION_PATTERN.sub(_correct_phrase, text.replace('\n', ' ').replace('\r', ' ').upper())
+
+    parts = []
+    last = 0
+    for keyword in _DATE_KEYWORD.finditer(cleaned):
+        start, end = keyword.span()
+        if start and cleaned[start - 1] in _ALNUM:
+            continue
+        stop = _KEYWORD_WINDOW.match(cleaned, end).end()
+        for match in _SUSPECT_TOKEN.finditer(cleaned, max(end, last), stop):
+            parts.append(cleaned[last:match.start()])
+            parts.append(match.group(0).translate(_DIGIT_CONFUSIONS))
+            last = match.end()
+    if not parts:
+        return cleaned
+    parts.append(cleaned[last:])
+    return ''.join(parts)
+
+
+MONTHS = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12,
+    # Common OCR misreads of month abbreviations
+    '5EP': 9, '0CT': 10, 'N0V': 11, 'FE8': 2, 'AU6': 8,
+}
+
+EXPIRY_PREFIXES = ('EXP', 'E3P', 'EXR', 'BB', '88', 'UB', 'BEST', 'USE')
+PRODUCTION_PREFIXES = ('MFG', 'MFD', 'MFT', 'PKD', 'PACKED', 'LOT', 'BATCH')
+
+_MONTH_NAME = (
+    r'JAN(?:UARY)?|FEB(?:RUARY)?|MAR(?:CH)?|APR(?:IL)?|MAY|JUNE?|JULY?|AUG(?:UST)?'
+    r'|SEP(?:T(?:EMBER)?)?|OCT(?:OBER)?|NOV(?:EMBER)?|DEC(?:EMBER)?|5EP|0CT|N0V|FE8|AU6'
+)
+
+_PREFIX = r"""
+    (?:(?<![A-Z])(?P<prefix>EXP(?:IRY)?|E3P|EXR|BB|88|UB|BEST\s*BEFORE|BEST\s*BY|USE\s*BY
+        |MFG|MFD|MFT|PKD|PACKED|LOT|BATCH)[\s:.\-/]*(?:(?:DATE|DT|ON)[\s:.\-/]*)?)?
+"""
+
+# One fragment per date shape; DATE_PATTERN tries them all, a learned format hint tries one
+DATE_SHAPES = {
+    # 2025-09-10
+    'ymd': r"""(?<!\d)(?P<ymd_y>(?:19|20)\d{2})[/\-.](?P<ymd_m>[01]?\d)[/\-.](?P<ymd_d>[0-3]?\d)(?!\d)""",
+    # 10/09/2025, 10.09 2025, 10,09,2025, 10 09 25
+    'dmy': r"""(?<!\d)(?P<dmy_d>[0-3]?\d)(?:[/\-.,]|\s+)(?P<dmy_m>[0-3]?\d)[/\-.,\s]+(?P<dmy_y>(?:19|20)\d{2}|\d{2})(?!\d)""",
+    # 4 MAR 2026, SEP.2025, SEPTEMBER 25
+    'mon': r"""(?:(?<!\d)(?P<mon_d>[0-3]?\d)[\s.\-/]*)?(?<![A-Z])(?P<mon_m>""" + _MONTH_NAME + r""")(?![A-Z])
+        [\s.,:\-/']*(?P<mon_y>(?:19|20)\d{2}|\d{2})(?!\d)""",
+    # 09/2025
+    'my': r"""(?<!\d)(?P<my_m>[01]?\d)[/\-.\s]+(?P<my_y>(?:19|20)\d{2})(?![/\-.]?\d)""",
+    # 2025/09
+    'ym': r"""(?<!\d)(?P<ym_y>(?:19|20)\d{2})[/\-.](?P<ym_m>[01]?\d)(?![/\-.]?\d)""",
+    # 09/25
+    'my2': r"""(?<!\d)(?P<my2_m>[01]\d)[/\-.](?P<my2_y>\d{2})(?![/\-.]?\d)""",
+}
+
+
+def _date_pattern(shapes):
+    return re.compile(_PREFIX + '(?:' + '\n|'.join(shapes) + ')', re.VERBOSE | re.IGNORECASE)
+
+
+DATE_PATTERN = _date_pattern(DATE_SHAPES.values())
+SHAPE_PATTERNS = {shape: _date_pattern([fragment]) for shape, fragment in DATE_SHAPES.items()}
+
+# Base score per date shape: complete dates beat month/year, 4-digit years beat 2-digit
+SHAPE_SCORES = {
+    'YYYY-MM-DD': 10,
+    'DD/MM/YYYY': 10,
+    'MM/DD/YYYY': 9,
+    'DD/MM/YY': 8,
+    'MM/DD/YY': 7,
+    'DD MON YYYY': 10,
+    'DD MON YY': 8,
+    'MON YYYY': 6,
+    'MON YY': 5,
+    'MM/YYYY': 5,
+    'YYYY/MM': 5,
+    'MM/YY': 4,
+}
+EXPIRY_PREFIX_BONUS = 5
+PRODUCTION_PREFIX_PENALTY = 6
+# Extra score for a date in the layout previously confirmed for the same product
+FORMAT_HINT_BONUS = 3
+
+# Date shape (DATE_SHAPES key) that produces each format
+FORMAT_SHAPES = {
+    'YYYY-MM-DD': 'ymd',
+    'DD/MM/YYYY': 'dmy',
+    'MM/DD/YYYY': 'dmy',
+    'DD/MM/YY': 'dmy',
+    'MM/DD/YY': 'dmy',
+    'DD MON YYYY': 'mon',
+    'DD MON YY': 'mon',
+    'MON YYYY': 'mon',
+    'MON YY': 'mon',
+    'MM/YYYY': 'my',
+    'YYYY/MM': 'ym',
+    'MM/YY': 'my2',
+}
+MONTH_FIRST_FORMATS = ('MM/DD/YYYY', 'MM/DD/YY')
+
+
+class DateCandidate(namedtuple('DateCandidate', ['date', 'score', 'fmt', 'prefix', 'span', 'text'])):
+    """A date found in OCR text, with the shape (fmt) and keyword prefix that produced it"""
+
+    @property
+    def confidence(self):
+        return round(min(max(self.score, 0) / 15.0, 1.0), 2)
+
+
+def _full_year(year_str):
+    year = int(year_str)
+    return 2000 + year if len(year_str) == 2 else year
+
+
+def _build(year_str, month, day):
+    """Construct a date for a shape, returning None when the parts are not a real date"""
+    try:
+        return datetime.date(_full_year(year_str), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _candidate_date(match, month_first=False):
+    """
+    Map a DATE_PATTERN (or SHAPE_PATTERNS) match onto (date, fmt). Ambiguous
+    numeric dates are read day-first unless month_first is set.
+    """
+    groups = match.groupdict()
+    if groups.get('ymd_y'):
+        return _build(groups['ymd_y'], groups['ymd_m'], groups['ymd_d']), 'YYYY-MM-DD'
+    if groups.get('dmy_y'):
+        day, month, year = groups['dmy_d'], groups['dmy_m'], groups['dmy_y']
+        two_digit = len(year) == 2
+        # Labels here are overwhelmingly day-first; read month-first only when forced or learned for the product
+        if int(day) <= 12 and (month_first or int(month) > 12):
+            fmt = 'MM/DD/YY' if two_digit else 'MM/DD/YYYY'
+            return _build(year, day, month), fmt
+        fmt = 'DD/MM/YY' if two_digit else 'DD/MM/YYYY'
+        return _build(year, month, day), fmt
+    if groups.get('mon_y'):
+        month = MONTHS.get(groups['mon_m'][:3].upper())
+        two_digit = len(groups['mon_y']) == 2
+        if groups['mon_d']:
+            fmt = 'DD MON YY' if two_digit else 'DD MON YYYY'
+            return _build(groups['mon_y'], month, groups['mon_d']), fmt
+        fmt = 'MON YY' if two_digit else 'MON YYYY'
+        return _build(groups['mon_y'], month, 1), fmt
+    if groups.get('my_y'):
+        return _build(groups['my_y'], groups['my_m'], 1), 'MM/YYYY'
+    if groups.get('ym_y'):
+        return _build(groups['ym_y'], groups['ym_m'], 1), 'YYYY/MM'
+    return _build(groups['my2_y'], groups['my2_m'], 1), 'MM/YY'
+
+
+def _scan(pattern, text, today, fmt_hint):
+    min_year, max_year = today.year - 2, today.year + 10
+    month_first = fmt_hint in MONTH_FIRST_FORMATS
+
+    candidates = []
+    for match in pattern.finditer(text):
+        date, fmt = _candidate_date(match, month_first=month_first)
+        if date is None or not min_year <= date.year <= max_year:
+            continue
+
+        score = SHAPE_SCORES[fmt]
+        if fmt == fmt_hint:
+            score += FORMAT_HINT_BONUS
+        prefix = match.group('prefix')
+        if prefix:
+            prefix = _WHITESPACE.sub(' ', prefix)
+            if prefix.startswith(EXPIRY_PREFIXES):
+                score += EXPIRY_PREFIX_BONUS
+            elif prefix.startswith(PRODUCTION_PREFIXES):
+                score -= PRODUCTION_PREFIX_PENALTY
+        candidates.append(DateCandidate(date, score, fmt, prefix, match.span(), match.group(0)))
+
+    # Highest score first; on ties prefer the later date (expiry comes after manufacture)
+    candidates.sort(key=lambda c: (-c.score, -c.date.toordinal()))
+    return candidates
+
+
+def extract_date_candidates(text, today=None, fmt_hint=None):
+    """
+    Scan OCR text once and return every plausible date, best candidate first.
+    Years must fall within two years back and ten years ahead of today.
+
+    fmt_hint is the format (a SHAPE_SCORES key) confirmed earlier for the same
+    product: its shape is tried on its own first, and the full scan only runs
+    when that finds nothing but production dates. A month-first hint also
+    settles ambiguous numeric dates such as 04/05/2026.
+    """
+    today = today or datetime.date.today()
+    text = text.upper()
+
+    shape = FORMAT_SHAPES.get(fmt_hint)
+    if shape:
+        candidates = _scan(SHAPE_PATTERNS[shape], text, today, fmt_hint)
+        if any(not (c.prefix or '').startswith(PRODUCTION_PREFIXES) for c in candidates):
+            return candidates
+    return _scan(DATE_PATTERN, text, today, fmt_hint)
+
+
+def extract_expiry_date(text, today=None, fmt_hint=None):
+    """Return the best DateCandidate in OCR text, or None"""
+    candidates = extract_date_candidates(text, today=today, fmt_hint=fmt_hint)
+    return candidates[0] if candidates else None
@@ -23,10 +23,11 @@ class UserProfileForm(forms.ModelForm):
 
     class Meta:
         model = UserProfile
-        fields = ['email_reminders_enabled', 'push_reminders_enabled']
+        fields = ['email_reminders_enabled', 'push_reminders_enabled', 'ocr_languages']
         widgets = {
             'email_reminders_enabled': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'push_reminders_enabled': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'ocr_languages': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'en,ml'}),
         }
 
 
@@ -38,6 +39,14 @@ class UserProfileForm(forms.ModelForm):
             self.fields['last_name'].initial = self.user.last_name
             self.fields['email'].initial = self.user.email
 
+    def clean_ocr_languages(self):
+        from .ocr import UnsupportedLanguage, normalize_languages
+        try:
+            languages = normalize_languages(self.cleaned_data.get('ocr_languages', ''))
+        except UnsupportedLanguage as e:
+            raise forms.ValidationError(str(e))
+        return ','.join(languages) if languages else ''
+
     def save(self, commit=True):
         profile = super().save(commit=False)
         if self.user:
@@ -0,0 +1,57 @@
+"""
+Barcode normalisation for catalog lookups.
+
+One product reaches us as UPC-A (12 digits), EAN-13, GTIN-14 or with extra
+leading zeros depending on the scanner and on who typed it into the products
+table. All of them share one canonical key: the GTIN-14, i.e. the digits
+left-padded with zeros to 14. UPC-E symbols are expanded to their UPC-A form
+first. Anything that is not a GTIN (QR payloads, CODE128 text) keys as itself.
+"""
+import re
+
+_SEPARATORS = re.compile(r'[\s\-]')
+
+
+def gtin_check_digit(digits):
+    """GS1 mod-10 check digit for the digits that precede it"""
+    total = sum(int(digit) * (3 if index % 2 == 0 else 1) for index, digit in enumerate(reversed(digits)))
+    return str((10 - total % 10) % 10)
+
+
+def expand_upce(code):
+    """UPC-A equivalent of an 8-digit UPC-E code (number system, 6 digits, check digit), or None"""
+    if len(code) != 8 or not code.isdigit() or code[0] not in '01':
+        return None
+    system, body, check = code[0], code[1:7], code[7]
+    last = body[5]
+    if last in '012':
+        manufacturer, product = body[0:2] + last + '00', '00' + body[2:5]
+    elif last == '3':
+        manufacturer, product = body[0:3] + '00', '000' + body[3:5]
+    elif last == '4':
+        manufacturer, product = body[0:4] + '0', '0000' + body[4]
+    else:
+        manufacturer, product = body[0:5], '0000' + last
+    return system + manufacturer + product + check
+
+
+def normalize_gtin(barcode, symbology=None):
+    """
+    Canonical catalog key for a scanned or typed barcode; '' for empty input.
+
+    Numeric codes of up to 14 digits become zero-padded GTIN-14 keys (so
+    036000291452, 0036000291452 and 00036000291452 collide). Pass the zbar
+    symbology ('UPCE') to expand UPC-E codes, which are otherwise
+    indistinguishable from EAN-8.
+    """
+    code = _SEPARATORS.sub('', (barcode or '').strip())
+    if not code.isdigit():
+        return (barcode or '').strip()
+    if symbology == 'UPCE':
+        code = expand_upce(code) or code
+    if len(code) > 14:
+        stripped = code.lstrip('0')
+        if len(stripped) > 14:
+            return code
+        code = stripped
+    return code.zfill(14)
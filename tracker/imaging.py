@@ -0,0 +1,210 @@
+"""
+Image ingest shared by the OCR and barcode endpoints.
+
+Clients may send raw bytes (application/octet-stream or image/*), a
+multipart/form-data file, or the older base64 data URL in a JSON/form field.
+Raw uploads are decoded straight from the request buffer with cv2.imdecode,
+and oversized photos are downscaled while decoding.
+"""
+import base64
+import binascii
+from io import BytesIO
+
+from django.conf import settings
+
+from .ocr_timing import stage
+
+
+class ImageUploadError(ValueError):
+    """The request did not carry a usable image"""
+    status_code = 400
+
+
+class ImageMissing(ImageUploadError):
+    pass
+
+
+class ImageTooLarge(ImageUploadError):
+    status_code = 413
+
+
+RAW_CONTENT_TYPES = ('application/octet-stream', 'image/')
+
+
+def check_upload_size(size):
+    max_bytes = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 8 * 1024 * 1024)
+    if size > max_bytes:
+        raise ImageTooLarge(f'Image is {size} bytes; the limit is {max_bytes} bytes')
+
+
+def _upload_buffer(upload):
+    """Buffer of an uploaded file without copying it when it is held in memory"""
+    check_upload_size(upload.size)
+    file = getattr(upload, 'file', None)
+    if hasattr(file, 'getbuffer'):
+        return file.getbuffer()
+    upload.seek(0)
+    return upload.read()
+
+
+def decode_base64_payload(image_data):
+    """Bytes of a base64 string, with or without a data:image/...;base64, prefix"""
+    if not isinstance(image_data, str):
+        raise ImageUploadError('Image must be a base64 string or a file upload')
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[-1]
+    # Reject before decoding: base64 is 4 characters per 3 bytes
+    check_upload_size(len(image_data) * 3 // 4)
+    try:
+        with stage('decode'):
+            return base64.b64decode(image_data)
+    except (binascii.Error, ValueError) as e:
+        raise ImageUploadError(f'Could not decode image: {e}')
+
+
+def is_raw_upload(request):
+    return request.content_type.startswith(RAW_CONTENT_TYPES)
+
+
+def read_image_payload(request, field='image'):
+    """
+    Encoded image bytes (or a zero-copy buffer) from a raw body, a multipart
+    file or a base64 field. Call before touching request.data for raw bodies.
+    """
+    if is_raw_upload(request):
+        body = request.body
+        if not body:
+            raise ImageMissing('No image provided')
+        check_upload_size(len(body))
+        return body
+
+    upload = request.FILES.get(field)
+    if upload is not None:
+        return _upload_buffer(upload)
+
+    data = getattr(request, 'data', request.POST)
+    image_data = data.get(field)
+    if not image_data:
+        raise ImageMissing('No image provided')
+    return decode_base64_payload(image_data)
+
+
+def read_image_payloads(request, field='images'):
+    """Batch variant of read_image_payload: multipart files or a list of base64 strings"""
+    uploads = request.FILES.getlist(field)
+    if uploads:
+        return [_upload_buffer(upload) for upload in uploads]
+
+    images = request.data.get(field) if isinstance(request.data, dict) else None
+    if not images or not isinstance(images, list):
+        raise ImageUploadError('Provide a non-empty list of images')
+    for index, image in enumerate(images):
+        if not isinstance(image, str) or not image:
+            raise ImageUploadError(f'Image {index} must be a base64 string or a file upload')
+    return images
+
+
+def decode_image(data, max_side=None):
+    """
+    Decode encoded image bytes into an OpenCV BGR array no larger than max_side
+    (IMAGE_MAX_SIDE by default). JPEGs are decoded at a reduced scale when the
+    header shows the photo is at least twice the cap, so full-size pixels are
+    never materialised.
+    """
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    if max_side is None:
+        max_side = getattr(settings, 'IMAGE_MAX_SIDE', 1600)
+
+    with stage('decode'):
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        flags = cv2.IMREAD_COLOR
+        if max_side:
+            try:
+                width, height = Image.open(BytesIO(data)).size  # header only, no pixel decode
+            except Exception:
+                width = height = 0
+            # cv2.imdecode flags that let libjpeg decode at 1/8, 1/4 or 1/2 scale directly
+            reduced_flags = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+            for factor, reduced_flag in reduced_flags:
+                if max(width, height) // factor >= max_side:
+                    flags = reduced_flag
+                    break
+
+        image = cv2.imdecode(buffer, flags)
+        if image is None:
+            raise ImageUploadError('Unsupported or corrupt image data')
+
+        height, width = image.shape[:2]
+        if max_side and max(height, width) > max_side:
+            scale = max_side / float(max(height, width))
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return image
+
+
+def letterbox(image, width, height):
+    """
+    Scale an image to fit width x height without changing its aspect ratio and
+    pad the rest with the image's mean intensity, so text keeps its shape.
+    """
+    import cv2
+
+    source_height, source_width = image.shape[:2]
+    scale = min(width / source_width, height / source_height)
+    new_width = max(1, min(width, round(source_width * scale)))
+    new_height = max(1, min(height, round(source_height * scale)))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    image = cv2.resize(image, (new_width, new_height), interpolation=interpolation)
+
+    top = (height - new_height) // 2
+    left = (width - new_width) // 2
+    fill = cv2.mean(image)[:1 if image.ndim == 2 else 3]
+    return cv2.copyMakeBorder(image, top, height - new_height - top, left, width - new_width - left,
+                              cv2.BORDER_CONSTANT, value=[round(value) for value in fill])
+
+
+def preprocess_expiry_frame(image):
+    """
+    Preprocessing used by the web scanner before OCR; returns a binarised grayscale frame.
+
+    Landscape (mobile) photos get CLAHE contrast enhancement and sharpening; every
+    frame is resized to 400x300, blurred and adaptively thresholded.
+    """
+    import cv2
+    import numpy as np
+
+    with stage('preprocess'):
+        # Mobile-specific preprocessing (detect based on image dimensions or EXIF if available)
+        height, width = image.shape[:2]
+        is_mobile = width > height  # Mobile cameras often have landscape orientation
+
+        if is_mobile:
+            # For mobile images: enhance contrast and sharpness
+            # Convert to LAB color space for better contrast adjustment
+            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+            l, a, b = cv2.split(lab)
+            # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
+            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+            l = clahe.apply(l)
+            lab = cv2.merge([l, a, b])
+            image = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+        # Resize to smaller resolution for faster processing
+        image = cv2.resize(image, (400, 300))
+        # Convert to grayscale
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        if is_mobile:
+            # Additional mobile-specific preprocessing
+            # Sharpen the image
+            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+            gray = cv2.filter2D(gray, -1, kernel)
+            # Increase contrast
+            gray = cv2.convertScaleAbs(gray, alpha=1.2, beta=10)
+
+        # Noise reduction with Gaussian blur
+        gray = cv2.GaussianBlur(gray, (3, 3), 0)
+        # Adaptive thresholding for binarization
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
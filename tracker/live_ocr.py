@@ -0,0 +1,292 @@
+"""
+Live expiry-date OCR over a WebSocket (served by expirytracker.asgi at /ws/ocr/).
+
+The client streams downscaled camera frames, either as binary JPEG/PNG/WebP
+messages or as JSON text {"type": "frame", "image": "<base64 data URL>"}. Per
+connection the server:
+
+* runs at most one inference at a time; frames arriving meanwhile replace a
+  single pending slot, so the next inference always uses the newest frame
+* skips OCR for frames whose perceptual hash (of the decoded grayscale frame,
+  before thresholding) is within OCR_LIVE_DEDUPE_DISTANCE bits of the last frame
+  it processed; such a frame votes for that frame's date again
+* counts the date found in each frame and sends a "result" message once one
+  date has been read from OCR_LIVE_STABLE_FRAMES frames
+
+A ?barcode= query parameter makes the parser try the date format learned for
+that product first (see BarcodeDateFormat); ?languages=en,ml picks the label
+languages, defaulting to the user's profile setting.
+
+Server messages are JSON: ready, candidate, no_date, result, busy and error.
+{"type": "reset"} from the client clears the votes.
+"""
+import asyncio
+import json
+import logging
+from collections import Counter
+from http.cookies import SimpleCookie
+from types import SimpleNamespace
+from importlib import import_module
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .imaging import ImageUploadError, check_upload_size, decode_base64_payload, decode_image, preprocess_expiry_frame
+from .ocr import OCRBusy, UnsupportedLanguage, language_suffix, languages_for, recognize_expiry
+from .ocr_cache import frame_digest, hamming_distance, ocr_result_cache, perceptual_hash
+from .ocr_timing import ocr_timing, stage
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH = '/ws/ocr/'
+
+
+def _headers(scope):
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+
+
+def _user_id_from_token(scope):
+    """Id of the active user named by a ?token=<JWT access token> query parameter (mobile/API clients)"""
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    if not token:
+        return None
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+    try:
+        user_id = AccessToken(token[0])['user_id']
+    except (TokenError, KeyError):
+        return None
+    user = get_user_model().objects.filter(pk=user_id).first()
+    return user.pk if user is not None and user.is_active else None
+
+
+def _origin_allowed(headers):
+    """Cookie-authenticated sockets must come from one of our own pages (no cross-site hijacking)"""
+    origin = headers.get('origin')
+    return bool(origin) and urlsplit(origin).netloc == headers.get('host')
+
+
+def _user_id_from_session(headers):
+    """
+    User id from the Django session cookie used by the web pages. Goes through
+    django.contrib.auth.get_user, so sessions invalidated by a password change
+    and inactive users are refused just as they are by the views.
+    """
+    from django.contrib.auth import get_user
+
+    cookies = SimpleCookie(headers.get('cookie', ''))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None or not _origin_allowed(headers):
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user = get_user(SimpleNamespace(session=session))
+    return user.pk if user.is_authenticated else None
+
+
+def authenticate_scope(scope):
+    return _user_id_from_token(scope) or _user_id_from_session(_headers(scope))
+
+
+def learned_format(scope):
+    """Date format learned for the ?barcode= query parameter, if any"""
+    from .models import BarcodeDateFormat
+
+    barcode = parse_qs(scope.get('query_string', b'').decode()).get('barcode')
+    return BarcodeDateFormat.hint_for(barcode[0].strip()) if barcode else None
+
+
+def scan_languages(scope, user_id):
+    """OCR languages from ?languages=, else the user's profile; raises UnsupportedLanguage"""
+    from django.contrib.auth.models import User
+
+    requested = parse_qs(scope.get('query_string', b'').decode()).get('languages')
+    return languages_for(requested[0] if requested else None, User.objects.filter(pk=user_id).first())
+
+
+def candidate_payload(candidate):
+    return {
+        'expiry_date': candidate.date.isoformat(),
+        'confidence': candidate.confidence,
+        'format': candidate.fmt,
+    }
+
+
+class LiveOCRSession:
+    """Frame dedupe, single-flight inference and result voting for one connection"""
+
+    def __init__(self, send, user_id, fmt_hint=None, languages=None):
+        self.send = send
+        self.user_id = user_id
+        self.fmt_hint = fmt_hint
+        self.languages = languages
+        self.cache_namespace = (f'ocr_live:{fmt_hint}' if fmt_hint else 'ocr_live') + language_suffix(languages)
+        self.dedupe_distance = getattr(settings, 'OCR_LIVE_DEDUPE_DISTANCE', 6)
+        self.stable_frames = getattr(settings, 'OCR_LIVE_STABLE_FRAMES', 2)
+        self.max_side = getattr(settings, 'OCR_LIVE_MAX_SIDE', 960)
+        self.pending = None
+        self.task = None
+        self.last_hash = None
+        self.last_candidate = None
+        self.votes = Counter()
+        self.candidates = {}
+        self.reported = None
+        self.frames = {'received': 0, 'replaced': 0, 'duplicates': 0, 'processed': 0}
+
+    async def send_json(self, message):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(message)})
+
+    def reset(self):
+        self.last_hash = None
+        self.last_candidate = None
+        self.votes.clear()
+        self.candidates.clear()
+        self.reported = None
+
+    def submit(self, frame):
+        """Queue a frame; only the newest frame waits while an inference is running"""
+        self.frames['received'] += 1
+        if self.pending is not None:
+            self.frames['replaced'] += 1
+        self.pending = frame
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        try:
+            while self.pending is not None:
+                frame, self.pending = self.pending, None
+                await self._process(frame)
+        finally:
+            self.task = None
+
+    def _infer(self, frame):
+        """
+        Blocking part, run in a worker thread: returns (kind, DateCandidate or None,
+        perceptual hash, StageTimer). Duplicates come back without a candidate.
+        """
+        with ocr_timing('ocr_live', user_id=self.user_id) as timer:
+            if isinstance(frame, str):
+                frame = decode_base64_payload(frame)
+            else:
+                check_upload_size(len(frame))
+            image = decode_image(frame, max_side=self.max_side)
+
+            # Hash before thresholding, which turns sensor noise into flipped bits
+            with stage('cache'):
+                image_hash = perceptual_hash(image)
+                if self.last_hash is not None and hamming_distance(image_hash, self.last_hash) <= self.dedupe_distance:
+                    return 'duplicate', None, image_hash, timer
+
+            gray = preprocess_expiry_frame(image)
+            with stage('cache'):
+                digest = frame_digest(gray)
+                cached = ocr_result_cache.get(self.cache_namespace, digest, self.user_id)
+
+            if cached is not None:
+                candidate = cached['expiry_date']
+            else:
+                text, candidate = recognize_expiry(gray, fmt_hint=self.fmt_hint, languages=self.languages)
+                ocr_result_cache.set(self.cache_namespace, digest, {'text': text, 'expiry_date': candidate},
+                                     self.user_id)
+        return 'processed', candidate, image_hash, timer
+
+    async def _process(self, frame):
+        try:
+            kind, candidate, image_hash, timer = await sync_to_async(self._infer, thread_sensitive=False)(frame)
+        except OCRBusy as e:
+            await self.send_json({'type': 'busy', 'retry_after': e.retry_after})
+            return
+        except ImageUploadError as e:
+            await self.send_json({'type': 'error', 'error': str(e)})
+            return
+        except Exception as e:
+            logger.exception('Live OCR frame failed')
+            await self.send_json({'type': 'error', 'error': str(e)})
+            return
+
+        if kind == 'duplicate':
+            # Same scene as the last processed frame: it reads the same date, so it votes again
+            self.frames['duplicates'] += 1
+            candidate = self.last_candidate
+        else:
+            # Only a frame that got through inference stands for its scene
+            self.frames['processed'] += 1
+            self.last_hash = image_hash
+            self.last_candidate = candidate
+
+        timings = timer.as_dict()
+        if candidate is None:
+            await self.send_json({'type': 'no_date', 'timings_ms': timings})
+            return
+
+        self.votes[candidate.date] += 1
+        best = self.candidates.get(candidate.date)
+        if best is None or candidate.score > best.score:
+            self.candidates[candidate.date] = candidate
+
+        leader, votes = self.votes.most_common(1)[0]
+        message = {'type': 'candidate', **candidate_payload(candidate), 'votes': self.votes[candidate.date], 'timings_ms': timings}
+        await self.send_json(message)
+
+        if votes >= self.stable_frames and leader != self.reported:
+            self.reported = leader
+            await self.send_json({
+                'type': 'result', 'stable': True, **candidate_payload(self.candidates[leader]),
+                'votes': votes, 'frames': dict(self.frames),
+            })
+
+    async def handle(self, message):
+        if message.get('bytes') is not None:
+            self.submit(message['bytes'])
+            return
+        try:
+            data = json.loads(message.get('text') or '{}')
+        except ValueError:
+            await self.send_json({'type': 'error', 'error': 'Messages must be binary frames or JSON'})
+            return
+        if data.get('type') == 'reset':
+            self.reset()
+        elif data.get('type') == 'frame' and data.get('image'):
+            self.submit(data['image'])
+        else:
+            await self.send_json({'type': 'error', 'error': 'Unknown message'})
+
+
+async def ocr_websocket(scope, receive, send):
+    """ASGI handler for the live OCR WebSocket"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    user_id = await sync_to_async(authenticate_scope)(scope)
+    if not user_id:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    try:
+        languages = await sync_to_async(scan_languages)(scope, user_id)
+    except UnsupportedLanguage:
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+    fmt_hint = await sync_to_async(learned_format)(scope)
+    await send({'type': 'websocket.accept'})
+    session = LiveOCRSession(send, user_id, fmt_hint=fmt_hint, languages=languages)
+    await session.send_json({
+        'type': 'ready', 'max_side': session.max_side, 'stable_frames': session.stable_frames,
+        'languages': list(languages),
+    })
+
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] == 'websocket.receive':
+                await session.handle(message)
+    finally:
+        session.pending = None
+        if session.task is not None:
+            session.task.cancel()
+        logger.info('Live OCR connection closed for user %s: %s', user_id, session.frames)
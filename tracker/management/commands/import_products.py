@@ -0,0 +1,64 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.product_import import run_import, start_import
+
+
+class Command(BaseCommand):
+    help = 'Load a CSV/TSV or JSON Lines product dump (optionally .gz) into the products table; resumable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dump to import')
+        parser.add_argument('--format', choices=['csv', 'tsv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--delimiter', help='CSV delimiter (default: comma, tab for .tsv)')
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--barcode-field', help='Barcode column/key (default: barcode, code, gtin or ean)')
+        parser.add_argument('--name-field', help='Product name column/key (default: product_name, name or title)')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows loaded and committed per batch')
+        parser.add_argument('--restart', action='store_true', help='Start from the top instead of resuming')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'No such file: {path}')
+
+        state = start_import(path, restart=options['restart'])
+        if state.finished_at:
+            self.stdout.write(f'{path} was already imported on {state.finished_at:%Y-%m-%d %H:%M} '
+                              f'({state.rows} rows); pass --restart to load it again')
+            return
+        if state.offset:
+            self.stdout.write(f'Resuming after {state.rows} rows (byte {state.offset})')
+
+        # Byte offsets are uncompressed, so there is no percentage for .gz files
+        total = None if path.endswith('.gz') else os.path.getsize(path)
+        start_rows = state.rows
+
+        def progress(state, elapsed):
+            rate = (state.rows - start_rows) / elapsed if elapsed else 0
+            done = f' ({state.offset / total:.1%})' if total else ''
+            self.stdout.write(f'{state.rows} rows{done}: {state.inserted} inserted, {state.updated} updated, '
+                              f'{state.skipped} skipped, {rate:.0f} rows/s')
+
+        try:
+            state = run_import(
+                state, path,
+                batch_size=options['batch_size'],
+                progress=progress,
+                fmt=options['format'],
+                delimiter=options['delimiter'],
+                encoding=options['encoding'],
+                barcode_field=options['barcode_field'],
+                name_field=options['name_field'],
+            )
+        except KeyboardInterrupt:
+            state.refresh_from_db()
+            raise CommandError(f'Interrupted after {state.rows} rows; run the same command again to resume')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {path}: {state.rows} rows, {state.inserted} products added, '
+            f'{state.updated} renamed, {state.skipped} skipped'
+        ))
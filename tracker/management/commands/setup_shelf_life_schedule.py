@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django_celery_beat.models import PeriodicTask, IntervalSchedule
+
+
+class Command(BaseCommand):
+    help = 'Set up the periodic rebuild of the shelf-life prediction table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=1, help='Rebuild interval in hours')
+        parser.add_argument('--now', action='store_true', help='Also run a full rebuild immediately')
+
+    def handle(self, *args, **options):
+        schedule, created = IntervalSchedule.objects.get_or_create(
+            every=options['hours'],
+            period=IntervalSchedule.HOURS,
+        )
+
+        # Incremental runs only read items added since the previous run, so they can run often
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Rebuild Shelf-Life Table',
+            defaults={
+                'task': 'tracker.tasks.rebuild_shelf_life',
+                'interval': schedule,
+                'enabled': True,
+            }
+        )
+
+        if created:
+            self.stdout.write(f'Created periodic task rebuilding shelf lives every {options["hours"]} hour(s)')
+        else:
+            self.stdout.write(f'Shelf-life rebuild now runs every {options["hours"]} hour(s)')
+
+        if options['now']:
+            from tracker.shelf_life import rebuild_shelf_life
+            result = rebuild_shelf_life(full=True)
+            self.stdout.write(f'Rebuilt shelf lives for {result["barcodes"]} barcodes from {result["items"]} items')
+
+        self.stdout.write(self.style.SUCCESS('Shelf-life scheduling setup complete!'))
+        self.stdout.write('Make sure Celery worker and beat are running:')
+        self.stdout.write('  celery -A expirytracker beat --loglevel=info --scheduler django_celery_beat.schedulers:DatabaseScheduler')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tracker.catalog import sync_catalog
+
+
+class Command(BaseCommand):
+    help = 'Add canonical GTIN keys for products added to the products table since the last sync'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every key (after barcodes were edited in place)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Products read per query')
+
+    def handle(self, *args, **options):
+        result = sync_catalog(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {result["scanned"]} products; the catalog now holds {result["catalog"]} GTIN keys'
+        ))
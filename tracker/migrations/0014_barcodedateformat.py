@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_donation_ngo_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarcodeDateFormat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barcode', models.CharField(max_length=100, unique=True)),
+                ('fmt', models.CharField(help_text='Date format, e.g. MM/YYYY', max_length=12)),
+                ('confirmations', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-17 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_barcodedateformat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShelfLife',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barcode', models.CharField(max_length=100, unique=True)),
+                ('histogram', models.JSONField(default=dict, help_text='Shelf life in days -> number of items')),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('median_days', models.IntegerField(blank=True, null=True)),
+                ('confidence', models.FloatField(default=0)),
+                ('last_item_id', models.BigIntegerField(default=0, help_text='Newest Item folded into the histogram')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
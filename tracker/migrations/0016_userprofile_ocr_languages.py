@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_shelflife'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='ocr_languages',
+            field=models.CharField(blank=True, default='', help_text='Comma-separated OCR languages for label scans, e.g. en,ml (empty uses the default)', max_length=50),
+        ),
+    ]
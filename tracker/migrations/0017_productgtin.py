@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-17 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_catalog(apps, schema_editor):
+    """Key every existing product; the products table is external, so it may not exist (e.g. test databases)"""
+    from tracker.gtin import normalize_gtin
+
+    if 'products' not in schema_editor.connection.introspection.table_names():
+        return
+    Product = apps.get_model('tracker', 'Product')
+    ProductGTIN = apps.get_model('tracker', 'ProductGTIN')
+
+    last = 0
+    while True:
+        chunk = list(Product.objects.filter(pk__gt=last).order_by('pk').values_list('pk', 'barcode')[:5000])
+        if not chunk:
+            break
+        entries = {}
+        for pk, barcode in chunk:
+            key = normalize_gtin(barcode)
+            if key and key not in entries:
+                entries[key] = ProductGTIN(gtin=key, product_id=pk, barcode=barcode)
+        ProductGTIN.objects.bulk_create(entries.values(), ignore_conflicts=True)
+        last = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0016_userprofile_ocr_languages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductGTIN',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gtin', models.CharField(max_length=100, unique=True)),
+                ('barcode', models.CharField(help_text='Barcode as stored in the products table', max_length=50)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='gtins', to='tracker.product')),
+            ],
+        ),
+        migrations.RunPython(build_catalog, migrations.RunPython.noop),
+    ]
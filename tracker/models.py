@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.models import User
@@ -35,6 +35,7 @@ class UserProfile(models.Model):
     email_reminders_enabled = models.BooleanField(default=True, help_text="Enable email reminders for expiring items")
     push_reminders_enabled = models.BooleanField(default=True, help_text="Enable push notifications for expiring items")
     reminder_days = models.PositiveIntegerField(default=7, help_text="Days before expiry to send reminders (1-30)")
+    ocr_languages = models.CharField(max_length=50, blank=True, default='', help_text="Comma-separated OCR languages for label scans, e.g. en,ml (empty uses the default)")
 
     def __str__(self):
         return f"{self.user.username}'s profile ({self.user_type})"
@@ -96,6 +97,88 @@ class Product(models.Model):
         return self.product_name
 
 
+class ProductGTIN(models.Model):
+    """Canonical GTIN key (tracker.gtin.normalize_gtin) of a row in the products table, for indexed lookups"""
+    gtin = models.CharField(max_length=100, unique=True)
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='gtins')
+    barcode = models.CharField(max_length=50, help_text="Barcode as stored in the products table")
+
+    def __str__(self):
+        return f"{self.gtin} -> {self.product_id}"
+
+
+class ProductImport(models.Model):
+    """Progress of one `manage.py import_products` run, committed with each batch so it can resume"""
+    source = models.CharField(max_length=500)
+    fingerprint = models.CharField(max_length=64, help_text="Hash of the file's size, mtime and first block")
+    offset = models.BigIntegerField(default=0, help_text="Bytes of the file loaded so far")
+    rows = models.BigIntegerField(default=0)
+    inserted = models.BigIntegerField(default=0)
+    updated = models.BigIntegerField(default=0)
+    skipped = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.rows} rows ({'done' if self.finished_at else 'in progress'})"
+
+
+class BarcodeDateFormat(models.Model):
+    """Expiry date format users have confirmed for a barcode, tried first on later scans of it"""
+    barcode = models.CharField(max_length=100, unique=True)
+    fmt = models.CharField(max_length=12, help_text="Date format, e.g. MM/YYYY")
+    confirmations = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.barcode}: {self.fmt} ({self.confirmations})"
+
+    @classmethod
+    def hint_for(cls, barcode):
+        from .gtin import normalize_gtin
+
+        barcode = normalize_gtin(barcode)
+        if not barcode:
+            return None
+        return cls.objects.filter(barcode=barcode).values_list('fmt', flat=True).first()
+
+    @classmethod
+    def record(cls, barcode, fmt):
+        """Count one confirmation; a different format has to outvote the learned one to replace it"""
+        from .date_extraction import SHAPE_SCORES
+        from .gtin import normalize_gtin
+
+        barcode = normalize_gtin(barcode)
+        if not barcode or fmt not in SHAPE_SCORES:
+            return
+        with transaction.atomic():
+            learned, created = cls.objects.select_for_update().get_or_create(barcode=barcode, defaults={'fmt': fmt})
+            if created:
+                return
+            if learned.fmt == fmt:
+                learned.confirmations += 1
+            elif learned.confirmations > 1:
+                learned.confirmations -= 1
+            else:
+                learned.fmt = fmt
+            learned.save()
+
+
+class ShelfLife(models.Model):
+    """Distribution of expiry_date - added_date over Item rows with one barcode (see tracker.shelf_life)"""
+    barcode = models.CharField(max_length=100, unique=True)
+    histogram = models.JSONField(default=dict, help_text="Shelf life in days -> number of items")
+    samples = models.PositiveIntegerField(default=0)
+    median_days = models.IntegerField(null=True, blank=True)
+    confidence = models.FloatField(default=0)
+    last_item_id = models.BigIntegerField(default=0, help_text="Newest Item folded into the histogram")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.barcode}: {self.median_days} days ({self.samples} items)"
+
+
 class NGOProfile(models.Model):
     """Profile for NGO organizations"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
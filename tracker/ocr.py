@@ -0,0 +1,652 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .date_extraction import correct_ocr_text, extract_expiry_date
+from .ocr_timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+class ReaderPoolTimeout(Exception):
+    """Raised when no EasyOCR reader could be checked out in time"""
+
+
+class UnsupportedLanguage(ValueError):
+    """Raised for OCR language codes outside OCR_AVAILABLE_LANGUAGES"""
+
+
+class OCRBusy(Exception):
+    """Raised when the OCR wait queue is full; retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OCRGovernor:
+    """
+    Admission control for OCR inference within one process.
+
+    At most ``max_inflight`` inferences run at once and at most ``max_queued``
+    callers wait for a slot, each for up to ``queue_timeout`` seconds. Anything
+    beyond that is refused with OCRBusy so the view can answer 429 instead of
+    letting every scan on the box slow down.
+    """
+
+    def __init__(self, max_inflight=1, max_queued=8, queue_timeout=10):
+        self.max_inflight = max(1, int(max_inflight))
+        self.max_queued = max(0, int(max_queued))
+        self.queue_timeout = queue_timeout
+        self._inflight = 0
+        self._queued = 0
+        self._cond = threading.Condition()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def _avg_seconds(self):
+        return self.total_seconds / self.admitted if self.admitted else 1.0
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up for a new caller"""
+        backlog = (self._queued + 1) / float(self.max_inflight)
+        return max(1, math.ceil(backlog * self._avg_seconds()))
+
+    def _reject(self, reason):
+        self.rejected += 1
+        raise OCRBusy(reason, retry_after=self.retry_after())
+
+    def _acquire(self):
+        with self._cond:
+            if self._inflight >= self.max_inflight:
+                if self._queued >= self.max_queued:
+                    self._reject(f'OCR is busy ({self._inflight} running, {self._queued} waiting)')
+                self._queued += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self._inflight >= self.max_inflight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject(f'Timed out after {self.queue_timeout}s waiting for OCR')
+                        self._cond.wait(remaining)
+                finally:
+                    self._queued -= 1
+            self._inflight += 1
+
+    @contextmanager
+    def admit(self):
+        with stage('queue'):
+            self._acquire()
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self._inflight -= 1
+                self.admitted += 1
+                self.total_seconds += elapsed
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_inflight': self.max_inflight,
+                'max_queued': self.max_queued,
+                'inflight': self._inflight,
+                'queued': self._queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_seconds': round(self._avg_seconds(), 4) if self.admitted else 0.0,
+                'torch_threads': torch_thread_budget(),
+            }
+
+
+def torch_thread_budget():
+    """Intra-op threads per inference: OCR_TORCH_THREADS, or the cores split across in-flight inferences"""
+    threads = getattr(settings, 'OCR_TORCH_THREADS', 0)
+    if threads:
+        return threads
+    return max(1, (os.cpu_count() or 1) // ocr_governor.max_inflight)
+
+
+def _apply_thread_budget():
+    """Cap torch intra-op threads so concurrent EasyOCR inferences do not oversubscribe the CPU"""
+    import torch
+
+    threads = torch_thread_budget()
+    torch.set_num_threads(threads)
+    logger.info('OCR thread budget: %d per inference, %d in flight', threads, ocr_governor.max_inflight)
+
+
+ocr_governor = OCRGovernor(
+    max_inflight=getattr(settings, 'OCR_MAX_INFLIGHT', 1),
+    max_queued=getattr(settings, 'OCR_MAX_QUEUED', 8),
+    queue_timeout=getattr(settings, 'OCR_QUEUE_TIMEOUT', 10),
+)
+
+
+class ReaderPool:
+    """
+    A bounded pool of warm EasyOCR readers.
+
+    Readers are created lazily, at most ``size`` of them, and are kept for the
+    lifetime of the worker process so detection/recognition weights are loaded
+    only once. Callers check a reader out, run inference and check it back in.
+    """
+
+    def __init__(self, languages, size=1, gpu=False, registry=None):
+        self.languages = list(languages)
+        self.size = max(1, int(size))
+        self.gpu = gpu
+        self.key = (tuple(self.languages), bool(gpu))
+        self.registry = registry
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+        # Counters used to size workers (see stats())
+        self.checkouts = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        self.load_time = 0.0
+        self.evicted = 0
+        self.last_used = time.monotonic()
+
+    def _load_reader(self):
+        # Imported here so only processes that actually run OCR pay for torch
+        import easyocr
+
+        _apply_thread_budget()
+        if self.registry is not None:
+            self.registry.make_room(self)
+        rss_before = resident_memory_mb()
+        started = time.monotonic()
+        reader = easyocr.Reader(self.languages, gpu=self.gpu)
+        elapsed = time.monotonic() - started
+        self.load_time += elapsed
+        if self.registry is not None:
+            self.registry.record_load(self, resident_memory_mb() - rss_before)
+        logger.info('Loaded EasyOCR reader %s (gpu=%s) in %.2fs', self.languages, self.gpu, elapsed)
+        return reader
+
+    def checkout(self, timeout=None):
+        """Take a reader from the pool, loading a new one if the pool is not full yet"""
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        reader = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    reader = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    # Reserve a slot; the (slow) model load happens outside the lock
+                    self._created += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise ReaderPoolTimeout(f'No OCR reader available after {timeout}s')
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - started
+            self.last_used = time.monotonic()
+            self.checkouts += 1
+            self.last_wait = waited
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited > 0.001:
+                self.waits += 1
+
+        if waited > 0.001:
+            logger.info('Waited %.3fs for an OCR reader (pool size %d)', waited, self.size)
+
+        if reader is None:
+            try:
+                reader = self._load_reader()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        return reader
+
+    def checkin(self, reader):
+        """Return a reader previously obtained with checkout()"""
+        with self._cond:
+            self._idle.append(reader)
+            self._cond.notify()
+
+    @contextmanager
+    def reader(self, timeout=None):
+        reader = self.checkout(timeout=timeout)
+        try:
+            yield reader
+        finally:
+            self.checkin(reader)
+
+    def evict_idle(self):
+        """Drop the readers nobody is using so their models can be freed; returns how many"""
+        with self._cond:
+            count = len(self._idle)
+            self._idle.clear()
+            self._created -= count
+            self.evicted += count
+            return count
+
+    def loaded(self):
+        with self._cond:
+            return self._created
+
+    def warm(self):
+        """Load every reader up front (e.g. when a worker process starts)"""
+        readers = [self.checkout() for _ in range(self.size)]
+        for reader in readers:
+            self.checkin(reader)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'languages': self.languages,
+                'gpu': self.gpu,
+                'size': self.size,
+                'loaded': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'total_wait_seconds': round(self.total_wait, 4),
+                'avg_wait_seconds': round(self.total_wait / self.checkouts, 4) if self.checkouts else 0.0,
+                'max_wait_seconds': round(self.max_wait, 4),
+                'last_wait_seconds': round(self.last_wait, 4),
+                'load_seconds': round(self.load_time, 2),
+                'evicted': self.evicted,
+            }
+
+
+def resident_memory_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS, but good enough where /proc is missing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class OCRModelRegistry:
+    """
+    Reader pools, one per (languages, gpu), under a per-process memory budget.
+
+    Pools are created on first use and readers load lazily as before. Before a
+    reader loads, idle readers of the least recently used other pools are
+    evicted until the new model fits in ``memory_cap_mb`` (0 disables the cap).
+    If readers that are busy elsewhere keep it from fitting, the scan is refused
+    with OCRBusy. Model sizes are the measured RSS growth of a load;
+    DEFAULT_MODEL_MB is assumed until one has been measured.
+    """
+
+    DEFAULT_MODEL_MB = 150
+
+    def __init__(self, memory_cap_mb=0):
+        self.memory_cap_mb = memory_cap_mb
+        self._pools = OrderedDict()  # least recently used first
+        self._model_mb = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.refusals = 0
+
+    def pool(self, languages, gpu):
+        key = (tuple(languages), bool(gpu))
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ReaderPool(languages, size=getattr(settings, 'OCR_READER_POOL_SIZE', 1), gpu=gpu, registry=self)
+                self._pools[key] = pool
+            self._pools.move_to_end(key)
+            return pool
+
+    def model_mb(self, pool):
+        return self._model_mb.get(pool.key, self.DEFAULT_MODEL_MB)
+
+    def _resident_mb(self):
+        return sum(pool.loaded() * self.model_mb(pool) for pool in self._pools.values())
+
+    def make_room(self, pool):
+        """Called before pool loads a reader (its slot is already counted as loaded)"""
+        if not self.memory_cap_mb:
+            return
+        with self._lock:
+            resident = self._resident_mb()
+            for other in list(self._pools.values()):
+                if resident <= self.memory_cap_mb:
+                    break
+                if other is pool:
+                    continue
+                evicted = other.evict_idle()
+                if evicted:
+                    resident -= evicted * self.model_mb(other)
+                    self.evictions += evicted
+                    logger.info('Evicted %d idle OCR reader(s) %s to load %s', evicted, other.languages, pool.languages)
+
+            own = pool.loaded() * self.model_mb(pool)
+            if resident > self.memory_cap_mb:
+                if resident > own:
+                    self.refusals += 1
+                    raise OCRBusy('OCR model memory is in use by other languages', retry_after=ocr_governor.retry_after())
+                logger.warning('OCR readers %s need %.0fMB, over the %dMB budget', pool.languages, own, self.memory_cap_mb)
+
+    def record_load(self, pool, measured_mb):
+        with self._lock:
+            self.loads += 1
+            # Concurrent loads only inflate the measurement, so keep the smallest one
+            if measured_mb > 1:
+                self._model_mb[pool.key] = min(measured_mb, self._model_mb.get(pool.key, measured_mb))
+
+    def pools(self):
+        with self._lock:
+            return list(self._pools.values())
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            models = [{
+                'languages': pool.languages,
+                'gpu': pool.gpu,
+                'readers': pool.loaded(),
+                'model_mb': round(self.model_mb(pool), 1),
+                'measured': pool.key in self._model_mb,
+                'resident_mb': round(pool.loaded() * self.model_mb(pool), 1),
+                'idle_seconds': round(now - pool.last_used, 1),
+            } for pool in reversed(self._pools.values())]
+            return {
+                'memory_cap_mb': self.memory_cap_mb,
+                'resident_mb': round(self._resident_mb(), 1),
+                'process_rss_mb': round(resident_memory_mb(), 1),
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'refusals': self.refusals,
+                'models': models,
+            }
+
+
+ocr_models = OCRModelRegistry(memory_cap_mb=getattr(settings, 'OCR_MODEL_MEMORY_MB', 0))
+
+
+# Our language codes -> each engine's; EasyOCR has no Malayalam model, so 'ml' is read by Tesseract only
+EASYOCR_LANGUAGES = {'en': 'en', 'hi': 'hi', 'ta': 'ta'}
+TESSERACT_LANGUAGES = {'en': 'eng', 'hi': 'hin', 'ml': 'mal', 'ta': 'tam'}
+
+
+def default_languages():
+    return tuple(getattr(settings, 'OCR_LANGUAGES', ['en']))
+
+
+def normalize_languages(languages):
+    """
+    Validated language codes from a list or a comma-separated string, English
+    first (dates and EXP/BB keywords are Latin script); None when empty.
+    """
+    if isinstance(languages, str):
+        languages = languages.split(',')
+    codes = [code.strip().lower() for code in languages or () if code and code.strip()]
+    if not codes:
+        return None
+    available = getattr(settings, 'OCR_AVAILABLE_LANGUAGES', ['en'])
+    unknown = sorted(set(codes) - set(available))
+    if unknown:
+        raise UnsupportedLanguage(f"Unsupported OCR language(s): {', '.join(unknown)}. Available: {', '.join(available)}")
+    return ('en',) + tuple(sorted(set(codes) - {'en'}))
+
+
+def languages_for(requested=None, user=None):
+    """OCR languages for a scan: the request's own, else the user's profile setting, else OCR_LANGUAGES"""
+    languages = normalize_languages(requested)
+    if languages is None and user is not None and user.is_authenticated:
+        from .models import UserProfile
+
+        profile_languages = UserProfile.objects.filter(user=user).values_list('ocr_languages', flat=True).first()
+        try:
+            languages = normalize_languages(profile_languages)
+        except UnsupportedLanguage:
+            # A language removed from OCR_AVAILABLE_LANGUAGES after the user picked it
+            languages = None
+    return languages or default_languages()
+
+
+def language_suffix(languages):
+    """Result-cache namespace suffix: empty for the default languages"""
+    if not languages or tuple(languages) == default_languages():
+        return ''
+    return ':' + '+'.join(languages)
+
+
+def easyocr_languages(languages):
+    """
+    EasyOCR codes for a language set. EasyOCR only combines English with one
+    other script per reader, so the first supported non-English one is used.
+    """
+    others = [EASYOCR_LANGUAGES[code] for code in languages or () if code != 'en' and code in EASYOCR_LANGUAGES]
+    return ['en'] + others[:1]
+
+
+def tesseract_languages(languages):
+    return '+'.join(TESSERACT_LANGUAGES[code] for code in languages or ('en',) if code in TESSERACT_LANGUAGES)
+
+
+def get_reader_pool(languages=None, gpu=None):
+    """Return the shared reader pool for the given EasyOCR languages, creating it on first use"""
+    languages = tuple(languages or getattr(settings, 'OCR_LANGUAGES', ['en']))
+    if gpu is None:
+        gpu = getattr(settings, 'OCR_USE_GPU', False)
+    return ocr_models.pool(languages, gpu)
+
+
+@contextmanager
+def ocr_reader(languages=None, gpu=None):
+    """Check out a warm reader from the shared pool for the duration of the block"""
+    pool = get_reader_pool(languages, gpu)
+    with stage('checkout'):
+        reader = pool.checkout(timeout=getattr(settings, 'OCR_READER_CHECKOUT_TIMEOUT', None))
+    try:
+        yield reader
+    finally:
+        pool.checkin(reader)
+
+
+def reader_pool_stats():
+    return [pool.stats() for pool in ocr_models.pools()]
+
+
+def model_memory_stats():
+    return ocr_models.stats()
+
+
+# Boxes whose text looks like part of a date label; recognised again at full resolution
+# when the downscaled read of them is not confident
+_ROI_KEYWORD = re.compile(r'EXP|E3P|BB|BEST|USE|UB|MFG|MFD|PKD', re.IGNORECASE)
+_ROI_DIGITS = re.compile(r'\d.*\d')
+
+
+def _scale_box(box, scale):
+    x_min, x_max, y_min, y_max = box
+    return [int(x_min * scale), int(x_max * scale), int(y_min * scale), int(y_max * scale)]
+
+
+def _bounds(points):
+    """[x_min, x_max, y_min, y_max] of a result's corner points"""
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return [min(xs), max(xs), min(ys), max(ys)]
+
+
+def _near_keyword(box, keyword_boxes):
+    """True if a box sits on the same line as, or the line just below, a keyword box"""
+    x_min, x_max, y_min, y_max = box
+    for kx_min, kx_max, ky_min, ky_max in keyword_boxes:
+        height = max(y_max - y_min, ky_max - ky_min)
+        if y_min < ky_max + height and y_max > ky_min - height / 2:
+            return True
+    return False
+
+
+def read_text_regions(reader, image):
+    """
+    Region-of-interest OCR with the same result format as reader.readtext().
+
+    Text detection and recognition run once on a copy downscaled to
+    OCR_ROI_DETECT_MAX_SIDE. Those results are kept (boxes mapped back to frame
+    coordinates); only a box with an expiry/MFG keyword, or digits on a keyword
+    line, whose confidence is below OCR_ROI_MIN_CONFIDENCE is recognised again
+    on its full-resolution crop. When nothing is detected the whole frame goes
+    through readtext().
+    """
+    import cv2
+
+    with stage('preprocess'):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    if not getattr(settings, 'OCR_ROI_ENABLED', True):
+        with stage('recognize'):
+            return reader.readtext(gray)
+
+    with stage('preprocess'):
+        height, width = gray.shape[:2]
+        max_side = getattr(settings, 'OCR_ROI_DETECT_MAX_SIDE', 960)
+        scale = max(height, width) / float(max_side)
+        small = cv2.resize(gray, (int(width / scale), int(height / scale)), interpolation=cv2.INTER_AREA) if scale > 1 else gray
+
+    with stage('detect'):
+        horizontal_list, free_list = reader.detect(small)
+    horizontal_list, free_list = horizontal_list[0], free_list[0]
+    with stage('recognize'):
+        if not horizontal_list and not free_list:
+            return reader.readtext(gray)
+        results = reader.recognize(small, horizontal_list=horizontal_list, free_list=free_list)
+    if scale <= 1:
+        return results
+
+    # recognize() may sort its output, so boxes come from each result's own corners
+    boxes = [_bounds(points) for points, _, _ in results]
+    keyword_boxes = [box for box, (_, text, _) in zip(boxes, results) if _ROI_KEYWORD.search(text)]
+    min_confidence = getattr(settings, 'OCR_ROI_MIN_CONFIDENCE', 0.5)
+    merged = []
+    for box, (points, text, confidence) in zip(boxes, results):
+        wanted = _ROI_KEYWORD.search(text) or (
+            _ROI_DIGITS.search(text) and (not keyword_boxes or _near_keyword(box, keyword_boxes))
+        )
+        if wanted and confidence < min_confidence:
+            with stage('recognize'):
+                again = reader.recognize(gray, horizontal_list=[_scale_box(box, scale)], free_list=[])
+            if again and again[0][2] > confidence:
+                merged.append(again[0])
+                continue
+        merged.append(([[int(x * scale), int(y * scale)] for x, y in points], text, confidence))
+    return merged
+
+
+class TierStats:
+    """Per-tier attempt/accept counters and latency totals for tiered OCR"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+
+    def record(self, tier, seconds, accepted):
+        with self._lock:
+            stats = self._tiers.setdefault(tier, {'attempts': 0, 'accepted': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            stats['attempts'] += 1
+            stats['accepted'] += int(accepted)
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                tier: {
+                    'attempts': stats['attempts'],
+                    'accepted': stats['accepted'],
+                    'hit_rate': round(stats['accepted'] / stats['attempts'], 4) if stats['attempts'] else 0.0,
+                    'avg_seconds': round(stats['total_seconds'] / stats['attempts'], 4) if stats['attempts'] else 0.0,
+                    'max_seconds': round(stats['max_seconds'], 4),
+                }
+                for tier, stats in self._tiers.items()
+            }
+
+
+tier_stats = TierStats()
+_tesseract_missing = False
+
+
+def _tesseract_text(image, lang=None):
+    import cv2
+    import pytesseract
+
+    # The tesseract subprocess reads this; keep it within the same per-inference budget as torch
+    os.environ.setdefault('OMP_THREAD_LIMIT', str(torch_thread_budget()))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    with stage('tesseract'):
+        # psm 11: sparse text, find as much text as possible in no particular order
+        return pytesseract.image_to_string(gray, lang=lang, config=getattr(settings, 'OCR_TESSERACT_CONFIG', '--psm 11'))
+
+
+def recognize_expiry(image, fmt_hint=None, languages=None):
+    """
+    Tiered OCR: returns (extracted_text, best DateCandidate or None).
+    fmt_hint is the date format learned for the product, if known; languages
+    (see languages_for) defaults to OCR_LANGUAGES.
+
+    The cheap Tesseract pass is accepted when the date extractor finds a candidate
+    with at least OCR_TIER_ACCEPT_CONFIDENCE; otherwise the frame escalates to a
+    pooled EasyOCR reader with region-of-interest recognition.
+    Both tiers run under ocr_governor, which raises OCRBusy when saturated.
+    """
+    with ocr_governor.admit():
+        return _recognize_expiry(image, fmt_hint, languages or default_languages())
+
+
+def _recognize_expiry(image, fmt_hint, languages):
+    global _tesseract_missing
+    if getattr(settings, 'OCR_TIERED_ENABLED', True) and not _tesseract_missing:
+        import pytesseract
+
+        started = time.monotonic()
+        try:
+            text = _tesseract_text(image, lang=tesseract_languages(languages))
+        except pytesseract.TesseractNotFoundError:
+            # No tesseract binary on this host: stop trying and go straight to EasyOCR
+            logger.warning('Tesseract is not installed; tiered OCR will use EasyOCR only')
+            _tesseract_missing = True
+            text = ''
+        except pytesseract.TesseractError as e:
+            logger.warning('Tesseract pass failed, escalating to EasyOCR: %s', e)
+            text = ''
+        with stage('parse'):
+            candidate = extract_expiry_date(correct_ocr_text(text), fmt_hint=fmt_hint)
+        accepted = candidate is not None and candidate.confidence >= getattr(settings, 'OCR_TIER_ACCEPT_CONFIDENCE', 0.65)
+        tier_stats.record('tesseract', time.monotonic() - started, accepted)
+        if accepted:
+            return text, candidate
+
+    started = time.monotonic()
+    with ocr_reader(easyocr_languages(languages)) as reader:
+        result = read_text_regions(reader, image)
+    with stage('parse'):
+        text = " ".join([res[1] for res in result])
+        candidate = extract_expiry_date(correct_ocr_text(text), fmt_hint=fmt_hint)
+    tier_stats.record('easyocr', time.monotonic() - started, candidate is not None)
+    return text, candidate
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def perceptual_hash(image):
+    """
+    64-bit DCT perceptual hash of an image (grayscale or BGR).
+
+    Frames that differ only by sensor noise, slight exposure changes or
+    re-encoding end up within a few bits of each other. Only good for telling
+    consecutive camera frames apart (live OCR dedupe), not as a result cache
+    key: it does not see the printed date.
+    """
+    import cv2
+    import numpy as np
+
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(small)[:8, :8].flatten()
+    # Compare against the median, ignoring the DC term which only tracks brightness
+    bits = low_freq > np.median(low_freq[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def frame_digest(image):
+    """Exact digest of a decoded or preprocessed frame (pixels and shape)"""
+    digest = hashlib.blake2b(str(image.shape).encode(), digest_size=16)
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class OCRResultCache:
+    """
+    In-process LRU cache of OCR results keyed on an exact frame digest.
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted once ``max_entries`` is reached. Entries are scoped per user, so a
+    result is only ever returned to the user whose upload produced it.
+
+    Perceptual hashes are not used as keys: a whole-frame hash cannot see the
+    date text, so two packs that differ only in their expiry date hash (almost)
+    the same, while real rescans of one label can land far apart.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (namespace, user_id, digest) -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace, digest, user_id=None):
+        now = time.monotonic()
+        key = (namespace, user_id, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and now - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, namespace, digest, value, user_id=None):
+        with self._lock:
+            key = (namespace, user_id, digest)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+ocr_result_cache = OCRResultCache(
+    max_entries=getattr(settings, 'OCR_CACHE_MAX_ENTRIES', 512),
+    ttl=getattr(settings, 'OCR_CACHE_TTL', 3600),
+)
@@ -0,0 +1,140 @@
+"""
+Per-stage timing for the OCR pipeline.
+
+An entry point (view, API view or Celery task) opens a timer with
+``ocr_timing(name)``; code deeper in the pipeline wraps its work in
+``stage('decode' | 'preprocess' | 'detect' | 'recognize' | 'parse' | ...)``
+without the timer being passed around. When no timer is active ``stage`` does
+nothing. Finished timers are logged as one JSON line on the
+``tracker.ocr.timing`` logger and added to per-stage latency histograms.
+"""
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger('tracker.ocr.timing')
+
+_current = contextvars.ContextVar('ocr_stage_timer', default=None)
+
+# Upper bounds of the histogram buckets, in milliseconds; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageTimer:
+    """Accumulated seconds per stage for one OCR request; repeated stages add up"""
+
+    def __init__(self, entry_point):
+        self.entry_point = entry_point
+        self.started = time.monotonic()
+        self.stages = {}
+        self.total = None
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self):
+        self.total = time.monotonic() - self.started
+
+    def as_dict(self):
+        """Stage durations in milliseconds, including the request total"""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+        if self.total is not None:
+            timings['total'] = round(self.total * 1000, 2)
+        return timings
+
+    def server_timing(self):
+        return server_timing_header(self.as_dict())
+
+
+def server_timing_header(timings):
+    """Server-Timing header value for a {stage: milliseconds} dict"""
+    return ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+
+
+@contextmanager
+def stage(name):
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timer.add(name, time.monotonic() - started)
+
+
+class StageHistograms:
+    """Process-wide latency histograms per (entry point, stage)"""
+
+    def __init__(self, buckets_ms=HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, entry_point, timings):
+        with self._lock:
+            for name, ms in timings.items():
+                series = self._series.setdefault((entry_point, name), {
+                    'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * (len(self.buckets_ms) + 1),
+                })
+                series['count'] += 1
+                series['sum_ms'] += ms
+                series['max_ms'] = max(series['max_ms'], ms)
+                series['buckets'][bisect_left(self.buckets_ms, ms)] += 1
+
+    def snapshot(self):
+        labels = [f'le_{bound}ms' for bound in self.buckets_ms] + ['inf']
+        with self._lock:
+            result = {}
+            for (entry_point, name), series in sorted(self._series.items()):
+                result.setdefault(entry_point, {})[name] = {
+                    'count': series['count'],
+                    'avg_ms': round(series['sum_ms'] / series['count'], 2),
+                    'max_ms': round(series['max_ms'], 2),
+                    'buckets': dict(zip(labels, series['buckets'])),
+                }
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+stage_histograms = StageHistograms()
+
+
+@contextmanager
+def ocr_timing(entry_point, **log_fields):
+    """Time one OCR request; yields the StageTimer, which is logged and recorded on exit"""
+    timer = StageTimer(entry_point)
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+        timer.finish()
+        # Requests that never reached the pipeline (page loads, rejected uploads) are not recorded
+        if timer.stages:
+            timings = timer.as_dict()
+            stage_histograms.observe(entry_point, timings)
+            logger.info(json.dumps({'event': 'ocr_timing', 'entry_point': entry_point, 'timings_ms': timings, **log_fields}))
+
+
+def timed_ocr_view(entry_point):
+    """Decorator for OCR views: times the request and adds a Server-Timing header to the response"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with ocr_timing(entry_point, method=request.method) as timer:
+                response = view(request, *args, **kwargs)
+            if timer.stages:
+                response['Server-Timing'] = timer.server_timing()
+            return response
+        return wrapper
+    return decorator
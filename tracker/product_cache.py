@@ -0,0 +1,200 @@
+"""
+Two-tier cache in front of the product catalog (tracker.catalog).
+
+Most scans are of a few popular products, so lookups first try an in-process
+LRU, then the shared Django cache (Redis when CACHE_URL is set, locmem
+otherwise), and only then the database. Barcodes that are not in the catalog
+are cached too, as negative entries with a shorter TTL, so unknown codes
+scanned over and over stop costing a query each.
+
+Entries are keyed by canonical GTIN (tracker.gtin.normalize_gtin). Keys are
+invalidated when catalog rows or products change (register_products and the
+post_save/post_delete handlers wired up in TrackerConfig.ready); a full
+catalog rebuild bumps a generation number that versions every shared key.
+Other processes' local LRUs pick that up within GENERATION_CHECK seconds and
+otherwise expire their entries after PRODUCT_CACHE_LOCAL_TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Shared-cache value of a barcode known not to be in the catalog
+MISSING = 'missing'
+GENERATION_KEY = 'product-cache:generation'
+GENERATION_CHECK = 5  # seconds between reads of the shared generation number
+
+
+def _cache_key(gtin):
+    # Non-GTIN codes (QR payloads, CODE128 text) may hold characters memcached/Redis keys should not
+    if not gtin.isdigit():
+        gtin = hashlib.sha1(gtin.encode()).hexdigest()
+    return f'product:{gtin}'
+
+
+def _to_entry(product):
+    return MISSING if product is None else (product.pk, product.barcode, product.product_name)
+
+
+def _to_product(entry):
+    from .models import Product
+
+    if entry == MISSING:
+        return None
+    pk, barcode, product_name = entry
+    return Product(id=pk, barcode=barcode, product_name=product_name)
+
+
+class ProductLookupCache:
+    """
+    In-process LRU (max_entries, local_ttl) over the shared Django cache
+    (shared_ttl). Negative entries live for negative_ttl in the shared tier and
+    for no longer than local_ttl in the local one.
+    """
+
+    def __init__(self, max_entries=4096, local_ttl=60, shared_ttl=86400, negative_ttl=300, alias='default'):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.negative_ttl = negative_ttl
+        self.alias = alias
+        self._entries = OrderedDict()  # gtin -> (expires_at, entry)
+        self._lock = threading.Lock()
+        self._generation = None
+        self._generation_read_at = 0.0
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def generation(self):
+        """Shared generation number, re-read at most every GENERATION_CHECK seconds"""
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_read_at > GENERATION_CHECK:
+            generation = self.shared.get(GENERATION_KEY)
+            if generation is None:
+                generation = 1
+                self.shared.add(GENERATION_KEY, generation, None)
+            with self._lock:
+                if self._generation is not None and generation != self._generation:
+                    self._entries.clear()
+                self._generation = generation
+                self._generation_read_at = now
+        return self._generation
+
+    def _remember(self, gtin, entry, now):
+        ttl = min(self.local_ttl, self.negative_ttl) if entry == MISSING else self.local_ttl
+        self._entries[gtin] = (now + ttl, entry)
+        self._entries.move_to_end(gtin)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, gtins):
+        """{gtin: Product or None (known missing)} for the gtins either tier holds"""
+        now = time.monotonic()
+        found = {}
+        remaining = []
+        with self._lock:
+            for gtin in gtins:
+                cached = self._entries.get(gtin)
+                if cached is not None and cached[0] < now:
+                    del self._entries[gtin]
+                    cached = None
+                if cached is None:
+                    remaining.append(gtin)
+                    continue
+                self._entries.move_to_end(gtin)
+                self.local_hits += 1
+                found[gtin] = cached[1]
+
+        if remaining:
+            keys = {_cache_key(gtin): gtin for gtin in remaining}
+            shared = self.shared.get_many(keys, version=self.generation())
+            with self._lock:
+                for key, entry in shared.items():
+                    gtin = keys[key]
+                    entry = entry if entry == MISSING else tuple(entry)
+                    self._remember(gtin, entry, now)
+                    found[gtin] = entry
+                self.shared_hits += len(shared)
+                self.misses += len(remaining) - len(shared)
+
+        with self._lock:
+            self.negative_hits += sum(entry == MISSING for entry in found.values())
+        return {gtin: _to_product(entry) for gtin, entry in found.items()}
+
+    def set_many(self, products):
+        """Cache {gtin: Product or None} as read from the database"""
+        if not products:
+            return
+        now = time.monotonic()
+        entries = {gtin: _to_entry(product) for gtin, product in products.items()}
+        with self._lock:
+            for gtin, entry in entries.items():
+                self._remember(gtin, entry, now)
+
+        generation = self.generation()
+        found = {_cache_key(gtin): entry for gtin, entry in entries.items() if entry != MISSING}
+        missing = {_cache_key(gtin): entry for gtin, entry in entries.items() if entry == MISSING}
+        if found:
+            self.shared.set_many(found, self.shared_ttl, version=generation)
+        if missing:
+            self.shared.set_many(missing, self.negative_ttl, version=generation)
+
+    def invalidate(self, gtins):
+        """Drop these keys from both tiers once the current transaction commits"""
+        gtins = [gtin for gtin in set(gtins) if gtin]
+        if gtins:
+            transaction.on_commit(lambda: self._invalidate(gtins))
+
+    def _invalidate(self, gtins):
+        with self._lock:
+            for gtin in gtins:
+                self._entries.pop(gtin, None)
+        self.shared.delete_many([_cache_key(gtin) for gtin in gtins], version=self.generation())
+
+    def clear(self):
+        """Invalidate every entry, in every process, once the current transaction commits"""
+        transaction.on_commit(self._clear)
+
+    def _clear(self):
+        try:
+            generation = self.shared.incr(GENERATION_KEY)
+        except ValueError:
+            generation = 2
+            self.shared.set(GENERATION_KEY, generation, None)
+        with self._lock:
+            self._entries.clear()
+            self._generation = generation
+            self._generation_read_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'generation': self._generation,
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'local_hit_rate': round(self.local_hits / lookups, 4) if lookups else 0.0,
+                'hit_rate': round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+product_cache = ProductLookupCache(
+    max_entries=getattr(settings, 'PRODUCT_CACHE_MAX_ENTRIES', 4096),
+    local_ttl=getattr(settings, 'PRODUCT_CACHE_LOCAL_TTL', 60),
+    shared_ttl=getattr(settings, 'PRODUCT_CACHE_TTL', 86400),
+    negative_ttl=getattr(settings, 'PRODUCT_CACHE_NEGATIVE_TTL', 300),
+)
@@ -0,0 +1,269 @@
+"""
+Bulk loader for the products table (manage.py import_products).
+
+Open product datasets come as CSV/TSV or JSON Lines dumps (optionally
+gzipped) with millions of rows. The file is streamed in batches: each batch is
+written to a temporary staging table (PostgreSQL COPY; plain INSERTs on other
+databases), de-duplicated by canonical GTIN (tracker.gtin.normalize_gtin,
+the last row wins) and upserted into products through the GTIN catalog:
+products whose key is already in the catalog get their name updated, the rest
+are inserted and keyed. Only one batch is held in memory at a time.
+
+Every batch commits together with its ProductImport checkpoint (the byte
+offset reached in the file), so an interrupted import resumes after the last
+committed batch when it is started again on the same, unchanged file.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .catalog import sync_catalog
+from .gtin import normalize_gtin
+from .models import Product, ProductGTIN, ProductImport
+from .product_cache import product_cache
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = 'product_import_staging'
+BARCODE_FIELDS = ('barcode', 'code', 'gtin', 'ean')
+NAME_FIELDS = ('product_name', 'name', 'title')
+BARCODE_MAX_LENGTH = Product._meta.get_field('barcode').max_length
+NAME_MAX_LENGTH = Product._meta.get_field('product_name').max_length
+
+
+def file_fingerprint(path):
+    """Identifies one version of a file: its size, mtime and first megabyte"""
+    stat = os.stat(path)
+    digest = hashlib.sha1(f'{stat.st_size}:{int(stat.st_mtime)}:'.encode())
+    with open(path, 'rb') as handle:
+        digest.update(handle.read(1024 * 1024))
+    return digest.hexdigest()
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'tsv' if name.endswith('.tsv') else 'csv'
+
+
+class _Lines:
+    """Decoded lines of a binary file, tracking the byte offset after the last line handed out"""
+
+    def __init__(self, handle, offset, encoding):
+        self.handle = handle
+        self.offset = offset
+        self.encoding = encoding
+
+    def __iter__(self):
+        for raw in self.handle:
+            self.offset += len(raw)
+            yield raw.decode(self.encoding, 'replace')
+
+
+def _pick(fields, wanted, candidates):
+    for name in ([wanted] if wanted else candidates):
+        if name in fields:
+            return name
+    return None
+
+
+def clean_record(barcode, name):
+    """(gtin, barcode, product_name) ready for staging, or None for unusable rows"""
+    barcode = str(barcode or '').strip()
+    name = ' '.join(str(name or '').split())[:NAME_MAX_LENGTH]
+    if not barcode or not name or len(barcode) > BARCODE_MAX_LENGTH:
+        return None
+    gtin = normalize_gtin(barcode)
+    return (gtin, barcode, name) if gtin else None
+
+
+def read_records(path, offset=0, fmt=None, delimiter=None, encoding='utf-8', barcode_field=None, name_field=None):
+    """
+    Yield (byte offset after the row, (gtin, barcode, name) or None when the row
+    is unusable) for every row of the file from `offset` on.
+    """
+    fmt = fmt or detect_format(path)
+    with _open(path) as handle:
+        if fmt == 'jsonl':
+            handle.seek(offset)
+            lines = _Lines(handle, offset, encoding)
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield lines.offset, None
+                    continue
+                if not isinstance(row, dict):
+                    yield lines.offset, None
+                    continue
+                barcode = _pick(row, barcode_field, BARCODE_FIELDS)
+                name = _pick(row, name_field, NAME_FIELDS)
+                yield lines.offset, clean_record(row.get(barcode), row.get(name))
+            return
+
+        delimiter = delimiter or ('\t' if fmt == 'tsv' else ',')
+        header_line = handle.readline()
+        header = next(csv.reader([header_line.decode(encoding, 'replace')], delimiter=delimiter), [])
+        fields = {name.strip(): index for index, name in enumerate(header)}
+        barcode = _pick(fields, barcode_field, BARCODE_FIELDS)
+        name = _pick(fields, name_field, NAME_FIELDS)
+        if barcode is None or name is None:
+            raise ValueError(f'{path}: no barcode/product name column in header {sorted(fields)}')
+        barcode, name = fields[barcode], fields[name]
+
+        offset = max(offset, len(header_line))
+        handle.seek(offset)
+        lines = _Lines(handle, offset, encoding)
+        # csv.reader pulls lines lazily, so lines.offset is the end of the row just returned
+        # (quoted fields spanning several lines included)
+        for row in csv.reader(lines, delimiter=delimiter):
+            if not row:
+                continue
+            if len(row) <= max(barcode, name):
+                yield lines.offset, None
+                continue
+            yield lines.offset, clean_record(row[barcode], row[name])
+
+
+def _create_staging(cursor):
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ('
+        f'line bigint, gtin varchar(100), barcode varchar({BARCODE_MAX_LENGTH}), '
+        f'product_name varchar({NAME_MAX_LENGTH}))'
+    )
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {STAGING_TABLE}_gtin ON {STAGING_TABLE} (gtin)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {STAGING_TABLE}_barcode ON {STAGING_TABLE} (barcode)')
+
+
+def _stage(cursor, rows):
+    columns = f'{STAGING_TABLE} (line, gtin, barcode, product_name)'
+    if connection.vendor != 'postgresql':
+        cursor.executemany(f'INSERT INTO {columns} VALUES (%s, %s, %s, %s)', rows)
+        return
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    sql = f'COPY {columns} FROM STDIN WITH (FORMAT csv)'
+    raw = cursor.cursor
+    if hasattr(raw, 'copy_expert'):  # psycopg2
+        raw.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _upsert(cursor):
+    """Merge the staging table into products and the catalog; returns (inserted, updated)"""
+    products = connection.ops.quote_name(Product._meta.db_table)
+    catalog = connection.ops.quote_name(ProductGTIN._meta.db_table)
+
+    # Last row per GTIN wins
+    cursor.execute(
+        f'DELETE FROM {STAGING_TABLE} WHERE line NOT IN (SELECT MAX(line) FROM {STAGING_TABLE} GROUP BY gtin)'
+    )
+    cursor.execute(
+        f'UPDATE {products} SET product_name = s.product_name FROM {STAGING_TABLE} s, {catalog} g '
+        f'WHERE g.gtin = s.gtin AND {products}.id = g.product_id AND {products}.product_name <> s.product_name'
+    )
+    updated = cursor.rowcount
+
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {products}')
+    last_id = cursor.fetchone()[0]
+    cursor.execute(
+        f'INSERT INTO {products} (barcode, product_name) SELECT s.barcode, s.product_name FROM {STAGING_TABLE} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {catalog} g WHERE g.gtin = s.gtin) ORDER BY s.line'
+    )
+    inserted = cursor.rowcount
+    # New rows are the ones above last_id, so the join with staging is a primary key range scan
+    cursor.execute(
+        f'INSERT INTO {catalog} (gtin, product_id, barcode) SELECT s.gtin, p.id, p.barcode '
+        f'FROM {products} p JOIN {STAGING_TABLE} s ON s.barcode = p.barcode WHERE p.id > %s '
+        f'ON CONFLICT (gtin) DO NOTHING',
+        [last_id],
+    )
+    return inserted, updated
+
+
+def _load_batch(state, batch, offset, skipped):
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {STAGING_TABLE}')
+            if batch:
+                _stage(cursor, batch)
+                inserted, updated = _upsert(cursor)
+            else:
+                inserted = updated = 0
+        state.offset = offset
+        state.rows += len(batch) + skipped
+        state.inserted += inserted
+        state.updated += updated
+        state.skipped += skipped
+        state.save(update_fields=['offset', 'rows', 'inserted', 'updated', 'skipped', 'updated_at'])
+        if inserted or updated:
+            product_cache.clear()
+
+
+def start_import(path, restart=False):
+    """
+    The ProductImport to continue for this file: the unfinished one for the
+    same file version, else a new one. A finished import is returned as is
+    unless restart=True.
+    """
+    fingerprint = file_fingerprint(path)
+    state = ProductImport.objects.filter(fingerprint=fingerprint).order_by('-pk').first()
+    if state is None or restart:
+        state = ProductImport.objects.create(source=os.path.abspath(path), fingerprint=fingerprint)
+    return state
+
+
+def run_import(state, path, batch_size=50000, progress=None, **read_options):
+    """
+    Load the file from state.offset on, committing state after every batch.
+    progress(state, elapsed seconds) is called after each batch.
+    """
+    # Products that are not keyed yet would otherwise be inserted a second time
+    sync_catalog()
+    with connection.cursor() as cursor:
+        _create_staging(cursor)
+
+    started = time.monotonic()
+    batch = []
+    skipped = 0
+    line = state.rows
+    offset = state.offset
+    for offset, record in read_records(path, offset=state.offset, **read_options):
+        line += 1
+        if record is None:
+            skipped += 1
+        else:
+            batch.append((line, *record))
+        if len(batch) + skipped >= batch_size:
+            _load_batch(state, batch, offset, skipped)
+            batch, skipped = [], 0
+            if progress:
+                progress(state, time.monotonic() - started)
+
+    _load_batch(state, batch, offset, skipped)
+    state.finished_at = timezone.now()
+    state.save(update_fields=['finished_at', 'updated_at'])
+    if progress:
+        progress(state, time.monotonic() - started)
+    logger.info('Product import %s: %s rows, %s inserted, %s updated, %s skipped',
+                state.source, state.rows, state.inserted, state.updated, state.skipped)
+    return state
@@ -1,13 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from .models import Item, UserProfile, Product
+from .models import BarcodeDateFormat, Item, UserProfile, Product
+from .date_extraction import SHAPE_SCORES
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
-        fields = ['email_reminders_enabled']
+        fields = ['email_reminders_enabled', 'ocr_languages']
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -67,13 +68,20 @@ class ItemSerializer(serializers.ModelSerializer):
 
 
 class ItemCreateSerializer(serializers.ModelSerializer):
+    # Format of a scanned date the user accepted unchanged; learned for the barcode
+    expiry_format = serializers.ChoiceField(choices=list(SHAPE_SCORES), required=False, write_only=True)
+
     class Meta:
         model = Item
-        fields = ['name', 'category', 'barcode', 'expiry_date', 'notes']
+        fields = ['name', 'category', 'barcode', 'expiry_date', 'notes', 'expiry_format']
 
     def create(self, validated_data):
+        expiry_format = validated_data.pop('expiry_format', None)
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        item = super().create(validated_data)
+        if expiry_format and item.barcode:
+            BarcodeDateFormat.record(item.barcode, expiry_format)
+        return item
 
 
 # NGO functionality removed - no NGO model exists
@@ -90,7 +98,15 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserProfile
-        fields = ['email_reminders_enabled', 'first_name', 'last_name', 'email']
+        fields = ['email_reminders_enabled', 'ocr_languages', 'first_name', 'last_name', 'email']
+
+    def validate_ocr_languages(self, value):
+        from .ocr import UnsupportedLanguage, normalize_languages
+        try:
+            languages = normalize_languages(value)
+        except UnsupportedLanguage as e:
+            raise serializers.ValidationError(str(e))
+        return ','.join(languages) if languages else ''
 
     def update(self, instance, validated_data):
         user_data = validated_data.pop('user', {})
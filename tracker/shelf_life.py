@@ -0,0 +1,145 @@
+"""
+Per-barcode shelf-life predictions.
+
+Items of one product are usually added a similar number of days before they
+expire, so expiry_date - added_date over earlier Item rows predicts the expiry
+of the next one. rebuild_shelf_life() folds Item rows added since the last run
+into a per-barcode histogram (ShelfLife); the rebuild_shelf_life Celery task
+runs it periodically. predict_expiry() turns a histogram into a date and a
+confidence, and high-confidence products can skip OCR altogether.
+"""
+import datetime
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .gtin import normalize_gtin
+from .models import Item, ShelfLife
+
+logger = logging.getLogger(__name__)
+
+# Longer gaps are typos (wrong year) rather than shelf lives
+MAX_SHELF_LIFE_DAYS = 3650
+
+
+def summarize(histogram):
+    """(samples, median days, confidence) for a {days: count} histogram"""
+    counts = sorted((int(days), count) for days, count in histogram.items())
+    samples = sum(count for _, count in counts)
+    if not samples:
+        return 0, None, 0.0
+
+    seen = 0
+    for days, count in counts:
+        seen += count
+        if seen * 2 >= samples:
+            median = days
+            break
+
+    # Share of items close to the median, discounted while there are only a few of them
+    tolerance = max(getattr(settings, 'SHELF_LIFE_TOLERANCE_DAYS', 7), round(median * 0.1))
+    within = sum(count for days, count in counts if abs(days - median) <= tolerance)
+    prior = getattr(settings, 'SHELF_LIFE_PRIOR_SAMPLES', 2)
+    confidence = round(within / samples * samples / (samples + prior), 2)
+    return samples, median, confidence
+
+
+def _merge(row, histogram, last_item_id):
+    for days, count in histogram.items():
+        row.histogram[str(days)] = row.histogram.get(str(days), 0) + count
+    row.samples, row.median_days, row.confidence = summarize(row.histogram)
+    row.last_item_id = max(row.last_item_id, last_item_id)
+    row.updated_at = timezone.now()  # bulk_update skips auto_now
+
+
+def rebuild_shelf_life(full=False, chunk_size=2000):
+    """
+    Fold Item rows newer than the last run into the ShelfLife table; full=True
+    rebuilds it from scratch (use it after bulk edits or deletes of items).
+    Returns {'items': rows folded in, 'barcodes': ShelfLife rows written}.
+    """
+    with transaction.atomic():
+        if full:
+            ShelfLife.objects.all().delete()
+            since = 0
+        else:
+            since = ShelfLife.objects.aggregate(Max('last_item_id'))['last_item_id__max'] or 0
+
+        rows = (
+            Item.objects.filter(pk__gt=since, barcode__isnull=False)
+            .exclude(barcode='')
+            .order_by('pk')
+            .values_list('pk', 'barcode', 'added_date', 'expiry_date')
+        )
+        histograms = {}
+        last_ids = {}
+        items = 0
+        for pk, barcode, added, expiry in rows.iterator(chunk_size=chunk_size):
+            days = (expiry - added).days
+            if not 0 <= days <= MAX_SHELF_LIFE_DAYS:
+                continue
+            barcode = normalize_gtin(barcode)
+            if not barcode:
+                continue
+            histograms.setdefault(barcode, Counter())[days] += 1
+            last_ids[barcode] = pk
+            items += 1
+
+        barcodes = list(histograms)
+        for start in range(0, len(barcodes), chunk_size):
+            chunk = barcodes[start:start + chunk_size]
+            existing = ShelfLife.objects.select_for_update().in_bulk(chunk, field_name='barcode')
+            created = []
+            for barcode in chunk:
+                row = existing.get(barcode)
+                if row is None:
+                    row = ShelfLife(barcode=barcode, histogram={})
+                    created.append(row)
+                _merge(row, histograms[barcode], last_ids[barcode])
+            ShelfLife.objects.bulk_create(created)
+            ShelfLife.objects.bulk_update(
+                list(existing.values()),
+                ['histogram', 'samples', 'median_days', 'confidence', 'last_item_id', 'updated_at'],
+            )
+
+    logger.info('Shelf-life table: folded %s items into %s barcodes (full=%s)', items, len(barcodes), full)
+    return {'items': items, 'barcodes': len(barcodes)}
+
+
+def _prediction(row, today):
+    if row is None or row.samples < getattr(settings, 'SHELF_LIFE_MIN_SAMPLES', 5):
+        return None
+    return {
+        'expiry_date': (today + datetime.timedelta(days=row.median_days)).isoformat(),
+        'shelf_life_days': row.median_days,
+        'confidence': row.confidence,
+        'samples': row.samples,
+        'skip_ocr': row.confidence >= getattr(settings, 'SHELF_LIFE_SKIP_OCR_CONFIDENCE', 0.8),
+    }
+
+
+def predict_expiry(barcode, today=None):
+    """
+    Predicted expiry for a new item with this barcode, or None when too few
+    items have been seen. skip_ocr is set once confidence reaches
+    SHELF_LIFE_SKIP_OCR_CONFIDENCE.
+    """
+    barcode = normalize_gtin(barcode)
+    if not barcode:
+        return None
+    row = ShelfLife.objects.filter(barcode=barcode).only('samples', 'median_days', 'confidence').first()
+    return _prediction(row, today or datetime.date.today())
+
+
+def predict_expiries(barcodes, today=None):
+    """predict_expiry for several barcodes with one query: {barcode: prediction or None}"""
+    keys = {barcode: normalize_gtin(barcode) for barcode in barcodes}
+    rows = ShelfLife.objects.only('barcode', 'samples', 'median_days', 'confidence').in_bulk(
+        {key for key in keys.values() if key}, field_name='barcode',
+    )
+    today = today or datetime.date.today()
+    return {barcode: _prediction(rows.get(key), today) for barcode, key in keys.items()}
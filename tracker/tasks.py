@@ -1,6 +1,7 @@
 import logging
 import time
-from celery import shared_task
+from celery import current_app, shared_task
+from celery.signals import worker_process_init
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
@@ -101,3 +102,53 @@ def send_reminder_email_with_retry(user, items, max_retries=3):
                 logger.error(f'Failed to send email to {user.email} after {max_retries} attempts')
 
     return False  # Failed after all retries
+
+
+@worker_process_init.connect
+def warm_ocr_readers(**kwargs):
+    """Load the OCR_LANGUAGES readers as each 'ocr' queue worker process starts, not on its first job"""
+    if 'ocr' not in current_app.amqp.queues.consume_from:
+        return
+    from .ocr import default_languages, easyocr_languages, get_reader_pool
+
+    try:
+        get_reader_pool(easyocr_languages(default_languages())).warm()
+    except Exception:
+        # The first job loads them instead
+        logger.exception('Could not preload OCR readers')
+
+
+@shared_task(bind=True, track_started=True, acks_late=True)
+def ocr_expiry_job(self, image_data, user_id, languages=None):
+    """Run expiry-date OCR for an image submitted through the API (routed to the 'ocr' queue)"""
+    from .api_views import detect_expiry_date
+    from .ocr_timing import ocr_timing
+
+    with ocr_timing('ocr_expiry_job', job_id=self.request.id) as timer:
+        result = detect_expiry_date(image_data, tuple(languages) if languages else None, user_id)
+    result['user_id'] = user_id
+    result['timings'] = timer.as_dict()
+    logger.info(f'OCR job {self.request.id} finished in {timer.total:.2f}s')
+    return result
+
+
+@shared_task(bind=True, track_started=True, acks_late=True)
+def ocr_expiry_batch_job(self, images, user_id, languages=None):
+    """Run batched expiry-date OCR for several images (routed to the 'ocr' queue)"""
+    from .api_views import detect_expiry_dates
+    from .ocr_timing import ocr_timing
+
+    with ocr_timing('ocr_expiry_batch_job', job_id=self.request.id, images=len(images)) as timer:
+        results = detect_expiry_dates(images, tuple(languages) if languages else None, user_id)
+    for result in results:
+        result.pop('status_code', None)
+    logger.info(f'OCR batch job {self.request.id} scanned {len(images)} images in {timer.total:.2f}s')
+    return {'results': results, 'user_id': user_id, 'timings': timer.as_dict()}
+
+
+@shared_task
+def rebuild_shelf_life(full=False):
+    """Fold newly added items into the per-barcode shelf-life table used to predict expiry dates"""
+    from . import shelf_life
+
+    return shelf_life.rebuild_shelf_life(full=full)
@@ -1,3 +1,246 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from .catalog import barcode_forms, lookup_products
+from .date_extraction import correct_ocr_text, extract_date_candidates, extract_expiry_date
+from .gtin import expand_upce, normalize_gtin
+from .models import Product, ProductGTIN, ProductImport
+from .product_cache import MISSING, ProductLookupCache, product_cache
+from .product_import import run_import, start_import
+from .views import _parse_expiry_date_string_slow, parse_expiry_date_string
+
+
+TODAY = datetime.date(2026, 10, 17)
+
+
+class CorrectOcrTextTests(TestCase):
+    def test_fixes_digits_next_to_a_date_keyword(self):
+        self.assertEqual(correct_ocr_text("EXP O9/2O27"), "EXP 09/2027")
+        self.assertEqual(correct_ocr_text("Best Before 1O/1O/2O27"), "BB 10/10/2027")
+
+    def test_normalises_keywords_and_month_misreads(self):
+        self.assertEqual(correct_ocr_text("E3P 5EP 2027"), "EXP SEP 2027")
+        self.assertEqual(correct_ocr_text("EXPIRY DATE 2027-09-10"), "EXP 2027-09-10")
+        self.assertEqual(correct_ocr_text("BATCH B0O2"), "LOT 8002")
+
+    def test_leaves_text_away_from_keywords_alone(self):
+        self.assertEqual(correct_ocr_text("SOLD 2O BOXES"), "SOLD 2O BOXES")
+
+    def test_keywords_must_stand_alone(self):
+        self.assertEqual(correct_ocr_text("EXPO9/2O27"), "EXPO9/2O27")
+        self.assertEqual(correct_ocr_text("REXP O9/2O27"), "REXP O9/2O27")
+
+
+class ExtractExpiryDateTests(TestCase):
+    def extract(self, text, fmt_hint=None):
+        return extract_expiry_date(correct_ocr_text(text), today=TODAY, fmt_hint=fmt_hint)
+
+    def assertExtracts(self, text, date, fmt, prefix=None, fmt_hint=None):
+        candidate = self.extract(text, fmt_hint)
+        self.assertIsNotNone(candidate, text)
+        self.assertEqual((candidate.date, candidate.fmt, candidate.prefix), (date, fmt, prefix))
+
+    def test_shapes(self):
+        cases = [
+            ("EXP 2027-09-10", datetime.date(2027, 9, 10), 'YYYY-MM-DD'),
+            ("EXP 15.09.2027", datetime.date(2027, 9, 15), 'DD/MM/YYYY'),
+            ("EXP 04/30/28", datetime.date(2028, 4, 30), 'MM/DD/YY'),
+            ("USE BY 4 MAR 2027", datetime.date(2027, 3, 4), 'DD MON YYYY'),
+            ("E3P 5EP 2027", datetime.date(2027, 9, 1), 'MON YYYY'),
+            ("BB SEP 27", datetime.date(2027, 9, 1), 'MON YY'),
+        ]
+        for text, date, fmt in cases:
+            with self.subTest(text=text):
+                candidate = self.extract(text)
+                self.assertEqual((candidate.date, candidate.fmt), (date, fmt))
+
+    def test_expiry_prefix_beats_production_prefix(self):
+        self.assertExtracts("MFG 01/2026 EXP 12/2027", datetime.date(2027, 12, 1), 'MM/YYYY', 'EXP')
+        self.assertExtracts("LOT 2027-01-01 EXP 2026-12-01", datetime.date(2026, 12, 1), 'YYYY-MM-DD', 'EXP')
+
+    def test_production_date_alone_has_low_confidence(self):
+        candidate = self.extract("MFG 10/10/2027")
+        self.assertEqual(candidate.prefix, 'MFG')
+        self.assertLess(candidate.confidence, self.extract("EXP 10/10/2027").confidence)
+
+    def test_ambiguous_dates_are_day_first_without_a_hint(self):
+        self.assertExtracts("04/05/2027", datetime.date(2027, 5, 4), 'DD/MM/YYYY')
+
+    def test_month_first_hint(self):
+        self.assertExtracts("04/05/2027", datetime.date(2027, 4, 5), 'MM/DD/YYYY', fmt_hint='MM/DD/YYYY')
+
+    def test_hint_falls_back_to_other_shapes(self):
+        self.assertExtracts("EXP 09/2027", datetime.date(2027, 9, 1), 'MM/YYYY', 'EXP', fmt_hint='MM/DD/YYYY')
+
+    def test_year_window(self):
+        self.assertIsNone(self.extract("EXP 12/1999"))
+        self.assertIsNone(self.extract("EXP 12/2045"))
+        self.assertIsNotNone(self.extract("EXP 12/2036"))
+
+    def test_no_date(self):
+        self.assertIsNone(self.extract("NET WT 500G"))
+        self.assertEqual(extract_date_candidates("", today=TODAY), [])
+
+
+class NormalizeGtinTests(TestCase):
+    def test_upc_a_ean_13_and_gtin_14_collide(self):
+        for barcode in ('036000291452', '0036000291452', '00036000291452', ' 036000-291452 ', '000036000291452'):
+            with self.subTest(barcode=barcode):
+                self.assertEqual(normalize_gtin(barcode), '00036000291452')
+
+    def test_ean_13_and_gtin_14(self):
+        self.assertEqual(normalize_gtin('4006381333931'), '04006381333931')
+        self.assertEqual(normalize_gtin('10036000291459'), '10036000291459')
+
+    def test_upc_e_needs_the_symbology(self):
+        self.assertEqual(expand_upce('01234565'), '012345000065')
+        self.assertEqual(normalize_gtin('01234565', symbology='UPCE'), '00012345000065')
+        self.assertEqual(normalize_gtin('01234565'), '00000001234565')
+        self.assertEqual(normalize_gtin('01234565', symbology='UPCE'), normalize_gtin('012345000065'))
+
+    def test_non_numeric_codes_key_as_themselves(self):
+        self.assertEqual(normalize_gtin(' https://example.com/p/1 '), 'https://example.com/p/1')
+        self.assertEqual(normalize_gtin('ABC-123'), 'ABC-123')
+        self.assertEqual(normalize_gtin('1234567890123456'), '1234567890123456')
+
+    def test_empty(self):
+        self.assertEqual(normalize_gtin(''), '')
+        self.assertEqual(normalize_gtin(None), '')
+
+    def test_barcode_forms(self):
+        forms = barcode_forms('00036000291452')
+        self.assertEqual(forms, {'36000291452', '036000291452', '0036000291452', '00036000291452'})
+        self.assertEqual(barcode_forms('ABC-123'), {'ABC-123'})
+
+
+class ParseExpiryDateStringTests(TestCase):
+    def test_fast_path_matches_the_strptime_chain(self):
+        for date_str in ('2027-09-10', '2027/9/1', '2027-09', '2027/09', '09/10/2027', '31/12/2027',
+                         '09/2027', '9-2027', 'Sep 2027', 'SEP 2027', '2027-02-30', '13/2027', '31/31/2027'):
+            with self.subTest(date_str=date_str):
+                self.assertEqual(parse_expiry_date_string(date_str), _parse_expiry_date_string_slow(date_str))
+
+    def test_unparseable(self):
+        self.assertIsNone(parse_expiry_date_string('not a date'))
+        self.assertIsNone(parse_expiry_date_string('2027-13-45'))
+
+
+class ProductTableMixin:
+    """Product is managed = False, so the test database has no products table until we create one"""
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Product)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(Product)
+
+    def setUp(self):
+        cache.clear()
+        product_cache._clear()
+
+
+class LookupProductsTests(ProductTableMixin, TestCase):
+    def test_catalog_hit(self):
+        product = Product.objects.create(barcode='4006381333931', product_name='Pencil')
+        ProductGTIN.objects.create(gtin='04006381333931', product=product, barcode=product.barcode)
+        self.assertEqual(lookup_products(['4006381333931']), {'4006381333931': product})
+
+    def test_fallback_finds_other_paddings_and_registers_them(self):
+        product = Product.objects.create(barcode='036000291452', product_name='Tissues')
+        self.assertEqual(lookup_products(['0036000291452'])['0036000291452'], product)
+        self.assertTrue(ProductGTIN.objects.filter(gtin='00036000291452', product=product).exists())
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_products(['00036000291452'])['00036000291452'], product)
+
+    def test_fallback_finds_non_numeric_codes(self):
+        product = Product.objects.create(barcode='ABC-123', product_name='Loose tea')
+        self.assertEqual(lookup_products([' ABC-123 '])[' ABC-123 '], product)
+
+    @override_settings(PRODUCT_CATALOG_FALLBACK=False)
+    def test_fallback_can_be_turned_off(self):
+        Product.objects.create(barcode='036000291452', product_name='Tissues')
+        self.assertIsNone(lookup_products(['036000291452'])['036000291452'])
+        self.assertFalse(ProductGTIN.objects.exists())
+
+    def test_misses_are_cached_under_the_canonical_key(self):
+        self.assertIsNone(lookup_products(['4006381333931'])['4006381333931'])
+        negative_hits = product_cache.stats()['negative_hits']
+        with self.assertNumQueries(0):
+            result = lookup_products(['04006381333931', '4006381333931'])
+        self.assertEqual(result, {'04006381333931': None, '4006381333931': None})
+        self.assertEqual(product_cache.stats()['negative_hits'], negative_hits + 1)
+
+    def test_adding_a_key_clears_the_cached_miss(self):
+        self.assertIsNone(lookup_products(['4006381333931'])['4006381333931'])
+        product = Product.objects.create(barcode='4006381333931', product_name='Pencil')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductGTIN.objects.create(gtin='04006381333931', product=product, barcode=product.barcode)
+        self.assertEqual(lookup_products(['4006381333931'])['4006381333931'], product)
+
+
+class ProductLookupCacheTests(TestCase):
+    def test_local_misses_expire_with_local_ttl(self):
+        lookup_cache = ProductLookupCache(local_ttl=60, negative_ttl=300)
+        lookup_cache.set_many({'04006381333931': None})
+        expires_at, entry = lookup_cache._entries['04006381333931']
+        self.assertEqual(entry, MISSING)
+        self.assertLessEqual(expires_at, time.monotonic() + 60)
+
+
+class ImportProductsTests(ProductTableMixin, TestCase):
+    def write_dump(self, lines):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as dump:
+            dump.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_upserts_by_gtin(self):
+        existing = Product.objects.create(barcode='036000291452', product_name='Old name')
+        path = self.write_dump([
+            'code,product_name',
+            '0036000291452,Tissues',
+            '4006381333931,Pencil',
+            ',No barcode',
+            '04006381333931,Pencil HB',
+        ])
+        state = run_import(start_import(path), path)
+
+        self.assertEqual((state.rows, state.inserted, state.updated, state.skipped), (4, 1, 1, 1))
+        self.assertIsNotNone(state.finished_at)
+        existing.refresh_from_db()
+        self.assertEqual(existing.product_name, 'Tissues')
+        self.assertEqual(Product.objects.get(barcode='04006381333931').product_name, 'Pencil HB')
+        self.assertEqual(ProductGTIN.objects.count(), 2)
+
+    def test_interrupted_import_resumes_after_the_last_batch(self):
+        path = self.write_dump(['barcode,name'] + [f'{4000000000000 + n},Product {n}' for n in range(10)])
+
+        def interrupt(state, elapsed):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            run_import(start_import(path), path, batch_size=4, progress=interrupt)
+        state = start_import(path)
+        self.assertEqual((state.rows, state.finished_at), (4, None))
+        self.assertEqual(Product.objects.count(), 4)
+
+        state = run_import(state, path, batch_size=4)
+        self.assertEqual((state.rows, state.inserted), (10, 10))
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(ProductImport.objects.count(), 1)
+
+        self.assertEqual(start_import(path).pk, state.pk)
+        self.assertNotEqual(start_import(path, restart=True).pk, state.pk)
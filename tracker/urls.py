@@ -2,8 +2,9 @@ from django.urls import path, include
 from . import views
 from .api_views import (
     RegisterView, LoginView, ItemListCreateView, ItemDetailView,
-    UserProfileView, ProductLookupView, ocr_expiry_api,
-    barcode_scan_api, donate_item_api, vapid_public_key,
+    UserProfileView, ProductLookupView, ocr_expiry_api, ocr_expiry_batch_api,
+    ocr_expiry_job_api, ocr_pool_stats_api, product_cache_stats_api, product_lookup_batch_api,
+    barcode_scan_api, item_scan_api, donate_item_api, vapid_public_key,
     subscribe_push, unsubscribe_push
 )
 
@@ -44,8 +45,14 @@ api_urlpatterns = [
     path('profile/', UserProfileView.as_view(), name='api_profile'),
     # path('ngos/', NGOListView.as_view(), name='api_ngos'),  # NGO functionality removed
     path('products/lookup/', ProductLookupView.as_view(), name='api_product_lookup'),
+    path('products/lookup/batch/', product_lookup_batch_api, name='api_product_lookup_batch'),
+    path('products/cache/stats/', product_cache_stats_api, name='api_product_cache_stats'),
     path('ocr/expiry/', ocr_expiry_api, name='api_ocr_expiry'),
+    path('ocr/expiry/batch/', ocr_expiry_batch_api, name='api_ocr_expiry_batch'),
+    path('ocr/expiry/<str:job_id>/', ocr_expiry_job_api, name='api_ocr_expiry_job'),
+    path('ocr/stats/', ocr_pool_stats_api, name='api_ocr_stats'),
     path('barcode/scan/', barcode_scan_api, name='api_barcode_scan'),
+    path('scan/item/', item_scan_api, name='api_item_scan'),
     path('donate/', donate_item_api, name='api_donate'),
     # Push notification endpoints
     path('notifications/vapid-public-key/', vapid_public_key, name='api_vapid_public_key'),
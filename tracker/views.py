@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
@@ -10,89 +10,32 @@ from django.template.loader import render_to_string
 from django.conf import settings
 import datetime
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from datetime import timedelta
-from .models import Item, Product, UserProfile
+from .models import BarcodeDateFormat, Item, UserProfile
 from .forms import ItemForm
-import easyocr
-from PIL import Image
+from .ocr import OCRBusy, UnsupportedLanguage, language_suffix, languages_for, recognize_expiry
+from .ocr_cache import frame_digest, ocr_result_cache
+from .ocr_timing import stage, timed_ocr_view
+from .shelf_life import predict_expiry
+from .catalog import find_product, iter_products, product_page
+from .imaging import ImageMissing, ImageUploadError, decode_image, preprocess_expiry_frame, read_image_payload
+import hashlib
+import json
+import logging
 import re
-import base64
-from io import BytesIO
-import cv2
-import numpy as np
 import calendar
+from functools import lru_cache
 from urllib.parse import urlencode, quote
 from dateutil.parser import parse as date_parser
 
-def correct_ocr_text(text):
-    """
-    Correct common OCR misreads in expiry date text for medicine, groceries, and food labels.
-    Includes context-aware replacements.
-    """
-    # Normalize and clean
-    cleaned = text.replace('\n',' ').replace('\r',' ').upper()
-
-    # Expanded corrections dictionary
-    corrections = {
-        # Month corrections
-        "5EP": "SEP",
-        "0CT": "OCT",
-        "N0V": "NOV",
-        "JULY": "JUL",
-        "AUGUST": "AUG",
-        "SEPTEMBER": "SEP",
-        "NOVEMBER": "NOV",
-        "DECEMBER": "DEC",
-        "JAN1": "JAN",
-        # Expiry prefixes
-        "E3P": "EXP",
-        "EXR": "EXP",
-        "EXPIRY": "EXP",
-        "EXPIRES": "EXP",
-        "BEST BEFORE": "BB",
-        "USE BY": "UB",
-        "MFG": "MFG",
-        "LOT": "LOT",
-        # Numbers and symbols
-        "O": "0",  # Use with caution
-        "S": "5",  # For 5 in dates
-        "Z": "2",  # For 2
-        "B": "8",  # For 8
-        "I": "1",  # For 1
-        # Separators
-        "|": "/",
-        "·": ".",
-        # Additional common misreads
-        "EXPIRY DATE": "EXP",
-        "BEST BY DATE": "BB",
-        "USE BY DATE": "UB",
-        "MANUFACTURED": "MFG",
-        "BATCH": "LOT",
-        "PRODUCED": "MFG",
-        "PACKED": "MFG",
-    }
-
-    # Apply general corrections
-    for wrong, right in corrections.items():
-        cleaned = cleaned.replace(wrong, right)
-
-    # Context-aware replacements: only replace if near date-related words
-    date_keywords = ["EXP", "BB", "UB", "MFG", "LOT"]
-    for keyword in date_keywords:
-        if keyword in cleaned:
-            # Replace numbers only in proximity to keywords (within 10 chars)
-            start = cleaned.find(keyword)
-            if start != -1:
-                end = start + len(keyword) + 10
-                segment = cleaned[start:end]
-                # Apply number corrections in this segment
-                segment = segment.replace("O", "0").replace("S", "5").replace("Z", "2").replace("B", "8").replace("I", "1")
-                cleaned = cleaned[:start] + segment + cleaned[end:]
-
-    return cleaned
+logger = logging.getLogger(__name__)
 
+@timed_ocr_view('ocr_expiry_view')
 def ocr_expiry_view(request):
     expiry_date = None
+    expiry_format = None
     extracted_text = None
     error_message = None
 
@@ -104,6 +47,9 @@ def ocr_expiry_view(request):
             # Handle confirmation
             confirmed_expiry = request.POST.get('confirmed_expiry', '').strip()
             if confirmed_expiry:
+                # Accepted unchanged: remember the date format for the next scan of this product
+                if confirmed_expiry == request.POST.get('detected_expiry', '').strip():
+                    BarcodeDateFormat.record(request.POST.get('barcode', '').strip(), request.POST.get('expiry_format', ''))
                 params = {
                     'barcode': request.POST.get('barcode', ''),
                     'product_name': request.POST.get('product_name', ''),
@@ -115,318 +61,76 @@ def ocr_expiry_view(request):
                 error_message = "Please provide a confirmed expiry date."
         else:
             # Handle scanning
-            b64_image = request.POST.get('captured_image')
-            if b64_image and b64_image.startswith('data:image'):
+            try:
+                # Multipart file, raw image body or base64 data URL; large photos are downscaled on decode
+                img_cv = decode_image(read_image_payload(request, field='captured_image'))
+            except ImageMissing:
+                img_cv = None
+                error_message = "No image captured."
+            except ImageUploadError as e:
+                img_cv = None
+                error_message = f"Error processing image: {e}"
+            if img_cv is not None:
                 try:
-                    # Decode and preprocess image for OCR
-                    b64_image = b64_image.split(',', 1)[1]
-                    img_data = base64.b64decode(b64_image)
-                    pil_img = Image.open(BytesIO(img_data))
-
-                    # Enhanced preprocessing: convert to grayscale, resize, noise reduction, thresholding
-                    img_cv = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-
-                    # Mobile-specific preprocessing (detect based on image dimensions or EXIF if available)
-                    height, width = img_cv.shape[:2]
-                    is_mobile = width > height  # Mobile cameras often have landscape orientation
-
-                    if is_mobile:
-                        # For mobile images: enhance contrast and sharpness
-                        # Convert to LAB color space for better contrast adjustment
-                        lab = cv2.cvtColor(img_cv, cv2.COLOR_BGR2LAB)
-                        l, a, b = cv2.split(lab)
-                        # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-                        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-                        l = clahe.apply(l)
-                        lab = cv2.merge([l, a, b])
-                        img_cv = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-
-                    # Resize to smaller resolution for faster processing
-                    img_cv = cv2.resize(img_cv, (400, 300))
-                    # Convert to grayscale
-                    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-
-                    if is_mobile:
-                        # Additional mobile-specific preprocessing
-                        # Sharpen the image
-                        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-                        gray = cv2.filter2D(gray, -1, kernel)
-                        # Increase contrast
-                        gray = cv2.convertScaleAbs(gray, alpha=1.2, beta=10)
-
-                    # Noise reduction with Gaussian blur
-                    gray = cv2.GaussianBlur(gray, (3, 3), 0)
-                    # Adaptive thresholding for binarization
-                    gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-
-                    # OCR extraction using EasyOCR with GPU if available for faster processing
-                    reader = easyocr.Reader(['en'], gpu=True)
-                    result = reader.readtext(gray)
-                    extracted_text = " ".join([res[1] for res in result])
-
-                    print("=== RAW OCR OUTPUT ===")
-                    print(repr(extracted_text))
-
-                    # Use the new correct_ocr_text function for normalization and corrections
-                    corrected = correct_ocr_text(extracted_text)
-                    print("=== CLEANED FOR REGEX ===")
-                    print(repr(corrected))
-
-                    # Expanded patterns for medicine, groceries, food packets, including full dates, 2/4-digit years
-                    patterns = [
-                        # Prioritize EXP with YYYY-MM-DD
-                        r'(EXP|BB|UB)[\s\:\.\-]*([1-2][0-9]{3})[\/\-\.][0-1][0-9][\/\-\.][0-3][0-9]',  # EXP 2025-09-10
-                        # General YYYY-MM-DD full dates (e.g., MFG 2025-09-10)
-                        r'([1-2][0-9]{3})[\/\-\.][0-1][0-9][\/\-\.][0-3][0-9]',  # 2025-09-10
-                        # Added: Prefix + MM/DD/YYYY (e.g., EXP 09/10/2025)
-                        r'(EXP|BB|UB)\s*([0-1][0-9])\/([0-3][0-9])\/([1-2][0-9]{3})',  # EXP 09/10/2025
-                        # Added: Prefix + DD/MM/YYYY (e.g., EXP 10/09/2025)
-                        r'(EXP|BB|UB)\s*([0-3][0-9])\/([0-1][0-9])\/([1-2][0-9]{3})',  # EXP 10/09/2025
-                        # New: Prefix + MM/DD/YYYY (e.g., EXP 09/10/2025) with words allowed
-                        r'(EXP|BB|UB)[\s\w]*([0-1][0-9])\/([0-3][0-9])\/([1-2][0-9]{3})',  # EXP 09/10/2025 (allow words like DATE between)
-                        # New: Prefix + DD/MM/YYYY (e.g., EXP 10/09/2025) with words allowed
-                        r'(EXP|BB|UB)[\s\w]*([0-3][0-9])\/([0-1][0-9])\/([1-2][0-9]{3})',  # EXP 10/09/2025
-                        # Added: Prefix + MM/DD/YY (e.g., EXP 04/30/26)
-                        r'(EXP|BB|UB)\s*([0-1][0-9])\/([0-3][0-9])\/([0-9]{2})',  # EXP 04/30/26
-                        # Added: Prefix + DD/MM/YY (e.g., EXP 30/04/26)
-                        r'(EXP|BB|UB)\s*([0-3][0-9])\/([0-1][0-9])\/([0-9]{2})',  # EXP 30/04/26
-                        # Prefixes with 3-letter month and year
-                        r'(EXP|BB|UB)[\s\:\.\-]*([A-Z]{3})[\s\.\:,]*([1-2][0-9]{3})\b',  # EXP/BB/UB SEP 2025 (fixed to 4-digit)
-                        r'\b([A-Z]{3})[\.\s\:\-,]*([1-2][0-9]{3})\b',                     # SEP.2025
-                        # Prefixes with numeric month and 4-digit year
-                        r'(EXP|BB|UB)[\s\:\.\-]*([01][0-9])[\/\.:\-\s]*([1-2][0-9]{3})',  # EXP 09/2025
-                        r'([01][0-9])[\/\.:\-\s]*([1-2][0-9]{3})',                         # 09/2025
-                        r'([1-2][0-9]{3})[\/\.:\-\s]*([01][0-9])',                         # 2025/09
-                        # Full dates DD/MM/YYYY or MM/DD/YYYY
-                        r'([0-3][0-9])[\/\-\.][0-1][0-9][\/\-\.][1-2][0-9]{3}',           # 25/04/2025 or 04/25/2025 (fixed year)
-                        r'([0-1][0-9])[\/\-\.][0-3][0-9][\/\-\.][1-2][0-9]{3}',           # 04/25/2025
-                        # Space-separated full dates DD MM YYYY (common on labels)
-                        r'([0-3][0-9])\s+([0-1][0-9])\s+([1-2][0-9]{3})',                # 19 04 2025
-                        r'([0-1][0-9])\s+([0-3][0-9])\s+([1-2][0-9]{3})',                # 04 19 2025
-                        # Prefixes with 3-letter month and 2-digit year
-                        r'(EXP|BB|UB)[\s\:\.\-]*([A-Z]{3})[\s\.\:,]*([0-9]{2})\b',           # EXP SEP 25
-                        r'\b([A-Z]{3})[\.\s\:\-,]*([0-9]{2})\b',                              # SEP.25
-                        # Prefixes with numeric month and 2-digit year
-                        r'(EXP|BB|UB)[\s\:\.\-]*([01][0-9])[\/\.:\-\s]*([0-9]{2})',          # EXP 09/25
-                        r'([01][0-9])[\/\.:\-\s]*([0-9]{2})',                                 # 09/25
-                        r'([0-9]{2})[\/\.:\-\s]*([01][0-9])',                                 # 25/09
-                        # Full dates with 2-digit year
-                        r'([0-3][0-9])[\/\-\.][0-1][0-9][\/\-\.][0-9]{2}',                   # 25/04/25
-                        r'([0-1][0-9])[\/\-\.][0-3][0-9][\/\-\.][0-9]{2}',                   # 04/25/25
-                        # Space-separated full dates with 2-digit year
-                        r'([0-3][0-9])\s+([0-1][0-9])\s+([0-9]{2})',                         # 19 04 25
-                        r'([0-1][0-9])\s+([0-3][0-9])\s+([0-9]{2})',                         # 04 19 25
-                        # Other common formats
-                        r'(EXP|BB|UB)[\s\:\.\-]*([1-2][0-9]{3})',                         # EXP 2025 (year only, rare)
-                        # DD.MM.YYYY (European) - PRIORITIZE THIS PATTERN - FIXED
-                        r'([0-3][0-9])\.([0-1][0-9])\.([1-2][0-9]{3})',                  # 15.09.2025
-                        r'([0-3][0-9])\.([0-1][0-9])\s+([1-2][0-9]{3})',                # 15.09 2025 (space separator)
-                        # DD,MM,YYYY (with commas - common in some regions)
-                        r'([0-3][0-9])\,([0-1][0-9])\,([1-2][0-9]{3})',                  # 25,04,2025
-                        # EXP: DD.MM,YYYY (specific pattern from your example)
-                        r'(EXP|BB|UB)\:\s*([0-3][0-9])\.([0-1][0-9])\,([1-2][0-9]{3})',  # EXP: 15.09,2025
-                        # Aggressive/fuzzy for 4-digit (moved lower to avoid false positives like PAT 2024)
-                        r'\b([5S][EP][F])[\.\s\:\-\,]*([1-2][0-9]{3})\b',                 # Accept OCR errors like 5EP 2025
-                        r'[E3][XK][P8][\s\:\.\-]*([A-Z0-9]{3})[\.\s\:\-\,]*([1-2][0-9]{3})\b', # E3P SEP 2025
-                        # Fuzzy for 2-digit
-                        r'\b([5S][EP][F])[\.\s\:\-\,]*([0-9]{2})\b',                         # SEP.25 fuzzy
-                        r'[E3][XK][P8][\s\:\.\-]*([A-Z0-9]{3})[\.\s\:\-\,]*([0-9]{2})\b',    # E3P SEP 25
-                        # Fuzzy full dates (last resort)
-                        r'([0-3]?[0-9]?)[\/\-\.\,]?([0-1]?[0-9]?)[\/\-\.\,]?([0-9]{2,4})',       # Loose match for partial dates
-                    ]
-                    current_year = datetime.datetime.now().year
-                    current_two_digit = current_year % 100
-
-                    valid_months = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
-                    possible_dates_with_scores = []  # List of (date, score) tuples
-                    today = datetime.date.today()
-
-                    for pattern in patterns:
-                        for match in re.finditer(pattern, corrected, re.IGNORECASE):
-                            groups = match.groups()
-                            if len(groups) >= 2:
-                                candidate_date = None
-                                score = 0  # Score based on completeness and specificity
-
-                                # Handle prefixed 4-group patterns (prefix + date parts)
-                                if len(groups) == 4 and groups[0] and groups[0].upper() in ['EXP', 'BB', 'UB']:
-                                    prefix, g1, g2, g3 = groups
-                                    score = 12  # High score for prefixed full dates
-                                    try:
-                                        if g3.isdigit():  # year last (MM/DD/YYYY, DD/MM/YYYY, or with 2-digit YY)
-                                            part1_str, part2_str, year_str = g1, g2, g3
-                                            p1 = int(part1_str)
-                                            p2 = int(part2_str)
-                                            if len(year_str) == 4:
-                                                year_int = int(year_str)
-                                                if current_year - 2 <= year_int <= current_year + 10:
-                                                    if p1 <= 12 and p1 >= 1:
-                                                        month_int, day_int = p1, p2
-                                                    else:
-                                                        month_int, day_int = p2, p1
-                                                    if 1 <= month_int <= 12 and 1 <= day_int <= 31:
-                                                        candidate_date = datetime.date(year_int, month_int, day_int)
-                                            elif len(year_str) == 2:
-                                                year_int = int(year_str)
-                                                base_year = 2000 + year_int
-                                                if year_int < (current_year % 100) - 10:
-                                                    base_year = 1900 + year_int
-                                                full_year = base_year
-                                                if current_year - 2 <= full_year <= current_year + 10:
-                                                    if p1 <= 12 and p1 >= 1:
-                                                        month_int, day_int = p1, p2
-                                                    else:
-                                                        month_int, day_int = p2, p1
-                                                    if 1 <= month_int <= 12 and 1 <= day_int <= 31:
-                                                        candidate_date = datetime.date(full_year, month_int, day_int)
-                                                        score = 10  # Slightly lower for 2-digit year
-                                        else:  # year first (YYYY-MM-DD)
-                                            year_str, month_str, day_str = g1, g2, g3
-                                            year_int = int(year_str)
-                                            month_int = int(month_str)
-                                            day_int = int(day_str)
-                                            if 1 <= month_int <= 12 and 1 <= day_int <= 31 and current_year - 2 <= year_int <= current_year + 10:
-                                                candidate_date = datetime.date(year_int, month_int, day_int)
-                                    except ValueError:
-                                        continue
-                                # Handle full date patterns (3 groups)
-                                elif len(groups) == 3:
-                                    g1, g2, g3 = groups
-                                    if g1 and g2 and g3:
-                                        score = 10  # High score for full dates
-                                        try:
-                                            # Special handling for European date format with space: DD.MM YYYY
-                                            if len(g1) == 2 and len(g2) == 2 and len(g3) == 4 and g1.isdigit() and g2.isdigit() and g3.isdigit():
-                                                # This is likely DD.MM YYYY format
-                                                day_int = int(g1)
-                                                month_int = int(g2)
-                                                year_int = int(g3)
-                                                if 1 <= day_int <= 31 and 1 <= month_int <= 12 and current_year - 2 <= year_int <= current_year + 10:
-                                                    candidate_date = datetime.date(year_int, month_int, day_int)
-                                                    score = 15  # Very high score for European date format
-                                            # Check if first group is 4-digit year (YYYY-MM-DD or YYYY MM DD)
-                                            elif len(g1) == 4 and g1.isdigit() and 2000 <= int(g1) <= 2035:
-                                                year_str, month_str, day_str = g1, g2, g3
-                                                year_int = int(year_str)
-                                                month_int = int(month_str)
-                                                day_int = int(day_str)
-                                                if 1 <= month_int <= 12 and 1 <= day_int <= 31 and current_year - 2 <= year_int <= current_year + 10:
-                                                    candidate_date = datetime.date(year_int, month_int, day_int)
-                                            # Otherwise, assume day/month/year or month/day/year (existing logic)
-                                            else:
-                                                p1 = int(g1)
-                                                p2 = int(g2)
-                                                year_int = int(g3)
-                                                if len(g3) == 2:
-                                                    base_year = 2000 + year_int
-                                                    if year_int < (current_year % 100) - 10:
-                                                        base_year = 1900 + year_int
-                                                    full_year = base_year
-                                                    score = 8  # Lower score for 2-digit year
-                                                else:
-                                                    full_year = year_int
-                                                if current_year - 2 <= full_year <= current_year + 10:
-                                                    if p1 <= 12 and p1 >= 1:
-                                                        month, day = p1, p2
-                                                    else:
-                                                        month, day = p2, p1
-                                                    if 1 <= month <= 12 and 1 <= day <= 31:
-                                                        candidate_date = datetime.date(full_year, month, day)
-                                        except ValueError:
-                                            continue
-                                else:
-                                    # Month/year or year/month patterns (2+ groups, take first two digits)
-                                    digit_groups = [g for g in groups if g and g.isdigit()]
-                                    if len(digit_groups) >= 2:
-                                        g1, g2 = digit_groups[0], digit_groups[1]
-                                        if g1 and g2:
-                                            score = 5  # Medium score for month/year patterns
-                                            # Check for year-month (4-digit year first, 2-digit month)
-                                            if len(g1) == 4 and 2000 <= int(g1) <= 2035 and len(g2) == 2 and 1 <= int(g2) <= 12:
-                                                try:
-                                                    candidate_date = datetime.date(int(g1), int(g2), 1)
-                                                except ValueError:
-                                                    pass
-                                            # Check for month-year (2-digit month first, 4-digit year)
-                                            elif len(g1) == 2 and 1 <= int(g1) <= 12 and len(g2) == 4 and 2000 <= int(g2) <= 2035:
-                                                try:
-                                                    candidate_date = datetime.date(int(g2), int(g1), 1)
-                                                except ValueError:
-                                                    pass
-                                            # Check for 2-digit year-month (e.g., 25-09 as 2025-09)
-                                            elif len(g1) == 2 and len(g2) == 2 and 1 <= int(g2) <= 12:
-                                                year_int = int(g1)
-                                                month_int = int(g2)
-                                                if year_int >= current_two_digit - 2 and year_int <= current_two_digit + 10:
-                                                    full_year = 2000 + year_int
-                                                    try:
-                                                        candidate_date = datetime.date(full_year, month_int, 1)
-                                                        score = 4  # Lower score for ambiguous 2-digit patterns
-                                                    except ValueError:
-                                                        pass
-                                            # Check for 2-digit month-year (09-25 as 2025-09)
-                                            elif len(g1) == 2 and 1 <= int(g1) <= 12 and len(g2) == 2:
-                                                year_int = int(g2)
-                                                month_int = int(g1)
-                                                if year_int >= current_two_digit - 2 and year_int <= current_two_digit + 10:
-                                                    full_year = 2000 + year_int
-                                                    try:
-                                                        candidate_date = datetime.date(full_year, month_int, 1)
-                                                        score = 4  # Lower score for ambiguous 2-digit patterns
-                                                    except ValueError:
-                                                        pass
-                                    # 3-letter month + year
-                                    month_str = next((g for g in groups if g and len(g) <= 3 and g.isalpha()), None)
-                                    if month_str:
-                                        month = month_str.upper()
-                                        year_str = next((g for g in groups if g and g.isdigit()), None)
-                                        if year_str:
-                                            score = 6  # Medium-high score for month names
-                                            try:
-                                                year_int = int(year_str)
-                                                if len(year_str) == 2:
-                                                    if year_int >= current_two_digit - 2 and year_int <= current_two_digit + 10:
-                                                        full_year = 2000 + year_int
-                                                    else:
-                                                        full_year = 2000 + year_int
-                                                else:
-                                                    full_year = year_int
-                                                if current_year - 2 <= full_year <= current_year + 10 and month in valid_months:
-                                                    month_num = valid_months.index(month) + 1
-                                                    candidate_date = datetime.date(full_year, month_num, 1)
-                                            except (ValueError, IndexError):
-                                                pass
-
-                                if candidate_date:
-                                    # Collect all plausible dates with their scores
-                                    if candidate_date > today or current_year - 2 <= candidate_date.year <= current_year + 10:
-                                        possible_dates_with_scores.append((candidate_date, score))
-
-                    # Select the date with highest score (completeness/specificity)
-                    if possible_dates_with_scores:
-                        # Sort by score (descending) then by date (latest first)
-                        possible_dates_with_scores.sort(key=lambda x: (-x[1], x[0]))
-                        best_date, best_score = possible_dates_with_scores[0]
-                        expiry_date = best_date.strftime("%Y-%m-%d")
-                        print(f"=== SELECTED DATE: {expiry_date} (score: {best_score}) ===")
+                    # Enhanced preprocessing: CLAHE/sharpening for landscape photos, resize, blur, thresholding
+                    gray = preprocess_expiry_frame(img_cv)
+                    # Date format users confirmed for this product before, tried first when parsing
+                    fmt_hint = BarcodeDateFormat.hint_for(barcode.strip())
+                    # Label languages: the form's own choice, else the user's profile setting
+                    languages = languages_for(request.POST.get('languages'), request.user)
+                    cache_namespace = (f'ocr_expiry_view:{fmt_hint}' if fmt_hint else 'ocr_expiry_view') + language_suffix(languages)
+
+                    # Skip inference entirely for frames this user has already sent
+                    with stage('cache'):
+                        digest = frame_digest(gray)
+                        cached = ocr_result_cache.get(cache_namespace, digest, request.user.pk)
+                    if cached is not None:
+                        extracted_text, expiry_date = cached['text'], cached['expiry_date']
+                        expiry_format = cached.get('fmt')
+                        logger.debug('OCR cache hit: %s', expiry_date)
                     else:
+                        # Tiered OCR: fast Tesseract pass, escalating to a pooled EasyOCR reader
+                        extracted_text, best = recognize_expiry(gray, fmt_hint=fmt_hint, languages=languages)
+
+                        print("=== RAW OCR OUTPUT ===")
+                        print(repr(extracted_text))
+
+                        if best:
+                            expiry_date = best.date.strftime("%Y-%m-%d")
+                            expiry_format = best.fmt
+                            print(f"=== SELECTED DATE: {expiry_date} ({best.fmt}, score: {best.score}) ===")
+                        ocr_result_cache.set(cache_namespace, digest, {
+                            'text': extracted_text,
+                            'expiry_date': expiry_date,
+                            'fmt': expiry_format,
+                        }, request.user.pk)
+
+                    if not expiry_date:
                         error_message = "Expiry not found or year looks unrealistic. Try again with a close, bright expiry region."
+                except UnsupportedLanguage as e:
+                    error_message = str(e)
+                except OCRBusy as e:
+                    # Too many scans in flight on this worker: tell the client when to retry
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        response = JsonResponse({'success': False, 'error': str(e)}, status=429)
+                        response['Retry-After'] = str(e.retry_after)
+                        return response
+                    error_message = f"The scanner is busy, please try again in {e.retry_after} seconds."
                 except Exception as e:
                     error_message = f"Error processing image: {e}"
-            else:
-                error_message = "No image captured."
 
     # AJAX or normal response
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     if request.method == "POST" and expiry_date and is_ajax:
         parsed = parse_expiry_date_string(expiry_date)
         if parsed:
-            return JsonResponse({'success': True, 'expiry_date': parsed.isoformat()})
+            return JsonResponse({'success': True, 'expiry_date': parsed.isoformat(), 'expiry_format': expiry_format})
         else:
             return JsonResponse({'success': False, 'error': 'Could not parse the detected date'})
 
     return render(request, 'ocr_expiry.html', {
         'expiry_date': expiry_date,
+        'expiry_format': expiry_format,
         'extracted_text': extracted_text,
         'error_message': error_message,
         'barcode': barcode,
@@ -487,8 +191,45 @@ def home(request):
     return render(request, 'home.html')
 
 
-# Helper to parse expiry string to proper date
-def parse_expiry_date_string(date_str):
+# Shapes of the date strings add_item receives (OCR results, the confirm form, manual entry),
+# each mapped straight to its constructor instead of trying strptime formats one by one
+_YMD_SHAPE = re.compile(r'(\d{4})([-/])(\d{1,2})(?:\2(\d{1,2}))?')   # 2025-09-10, 2025/09/10, 2025-09, 2025/09
+_NN_YYYY_SHAPE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')          # 09/10/2025 (month first, then day first)
+_MY_SHAPE = re.compile(r'(\d{1,2})[-/](\d{4})')                      # 09/2025, 09-2025
+_MON_Y_SHAPE = re.compile(r'([A-Za-z]{3})\s+(\d{4})')                 # SEP 2025
+_MONTH_ABBRS = {name.upper(): number for number, name in enumerate(calendar.month_abbr) if name}
+
+
+def _parse_date_shape(date_str):
+    """
+    Fast path for parse_expiry_date_string: classify the string once and build
+    the date directly. Returns None when the shape is unknown or the parts are
+    not a real date, leaving those strings to the strptime/dateutil chain.
+    """
+    try:
+        match = _YMD_SHAPE.fullmatch(date_str)
+        if match:
+            year, _, month, day = match.groups()
+            return datetime.date(int(year), int(month), int(day) if day else 1)
+        match = _NN_YYYY_SHAPE.fullmatch(date_str)
+        if match:
+            first, second, year = (int(part) for part in match.groups())
+            try:
+                return datetime.date(year, first, second)
+            except ValueError:
+                return datetime.date(year, second, first)
+        match = _MY_SHAPE.fullmatch(date_str)
+        if match:
+            return datetime.date(int(match.group(2)), int(match.group(1)), 1)
+        match = _MON_Y_SHAPE.fullmatch(date_str)
+        if match and match.group(1).upper() in _MONTH_ABBRS:
+            return datetime.date(int(match.group(2)), _MONTH_ABBRS[match.group(1).upper()], 1)
+    except ValueError:
+        pass
+    return None
+
+
+def _parse_expiry_date_string_slow(date_str):
     # Full date formats first (keep day)
     for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y/%m", "%m/%d/%Y", "%d/%m/%Y", "%m/%Y", "%m-%Y", "%b %Y"):
         try:
@@ -502,9 +243,22 @@ def parse_expiry_date_string(date_str):
     try:
         parsed = date_parser(date_str)
         return parsed.date()
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError):
         return None
 
+
+@lru_cache(maxsize=1024)
+def _parse_expiry_date_string(date_str, today):
+    # today is only part of the key: dateutil fills missing fields from the current date
+    return _parse_date_shape(date_str) or _parse_expiry_date_string_slow(date_str)
+
+
+# Helper to parse expiry string to proper date
+def parse_expiry_date_string(date_str):
+    if not isinstance(date_str, str):
+        return _parse_expiry_date_string_slow(date_str)
+    return _parse_expiry_date_string(date_str, datetime.date.today())
+
 @login_required
 def add_item(request):
     if request.method == 'POST':
@@ -523,6 +277,7 @@ def add_item(request):
         expiry_date_raw = request.GET.get('expiry_date', '').strip()
 
         initial_data = {'barcode': barcode}
+        predicted_expiry = None
         if product_name:
             initial_data['name'] = product_name
         if expiry_date_raw:
@@ -531,6 +286,13 @@ def add_item(request):
                 initial_data['expiry_date'] = parsed.isoformat()
             else:
                 initial_data['expiry_date'] = expiry_date_raw  # fallback if can't parse
+        elif barcode:
+            # Products we have seen often enough get their usual shelf life prefilled, no OCR needed
+            predicted_expiry = predict_expiry(barcode)
+            if predicted_expiry and predicted_expiry['skip_ocr']:
+                initial_data['expiry_date'] = predicted_expiry['expiry_date']
+            else:
+                predicted_expiry = None
 
         form = ItemForm(initial=initial_data)
 
@@ -539,6 +301,7 @@ def add_item(request):
         if barcode:
             context['barcode'] = barcode
             context['product_name'] = product_name
+            context['predicted_expiry'] = predicted_expiry
             return render(request, 'add_item_with_barcode.html', context)
         else:
             return render(request, 'add_item.html', context)
@@ -547,22 +310,66 @@ def scan_product(request):
     today_date = datetime.date.today().isoformat()
     return render(request, 'scan.html', {'today_date': today_date})
 
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value >= 0 else default
+
+
 def product_list(request):
-    products_qs = Product.objects.all().values()
-    return JsonResponse(list(products_qs), safe=False)
+    """
+    Products in id order, one keyset page at a time: ?after=<last id seen>&limit=N.
+    ?format=ndjson streams the whole catalog after `after` as one JSON object per line.
+
+    Pages carry an ETag (a hash of the page body), so unchanged pages get a 304.
+    The export has no validator: only its full contents would be one, and the
+    products table is also edited outside this app (imports, raw SQL).
+    """
+    after = _positive_int(request.GET.get('after'), 0)
+
+    if request.GET.get('format') == 'ndjson':
+        def lines():
+            chunk_size = getattr(settings, 'PRODUCT_EXPORT_CHUNK_SIZE', 5000)
+            for product in iter_products(after, chunk_size):
+                yield json.dumps(product) + '\n'
+
+        response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="products.ndjson"'
+    else:
+        limit = min(
+            _positive_int(request.GET.get('limit'), getattr(settings, 'PRODUCT_PAGE_SIZE', 500)) or 1,
+            getattr(settings, 'PRODUCT_PAGE_MAX_SIZE', 5000),
+        )
+        products = product_page(after, limit)
+        body = json.dumps({
+            'results': products,
+            'next': reverse('product_list') + '?' + urlencode({'after': products[-1]['id'], 'limit': limit})
+            if len(products) == limit else None,
+        })
+        etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+    return response
 
 def lookup_product(request):
     barcode = request.GET.get('barcode', '').strip()
-    try:
-        product = Product.objects.get(barcode=barcode)
+    product = find_product(barcode)
+    if product is not None:
         return JsonResponse({
             'exists': True,
             'product_name': product.product_name,
+            'predicted_expiry': predict_expiry(barcode),
         })
-    except Product.DoesNotExist:
+    else:
         return JsonResponse({
             'exists': False,
             'product_name': None,
+            'predicted_expiry': predict_expiry(barcode),
         })
 
 @login_required